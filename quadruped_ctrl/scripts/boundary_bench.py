@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+# micro-benchmarks of every python <-> c++ and python <-> pybullet call of the
+# control tick, and of the whole tick, against the budget of 1 / freq
+#   rosrun quadruped_ctrl boundary_bench.py --json bench.json
+#   rosrun quadruped_ctrl boundary_bench.py --baseline bench.json --json run.json
+# every call starts from the same snapshot of a trotting robot. the json holds
+# the per call and per stage timings, the exit code is 1 when a call got slower
+# than the baseline or the tick p99 does not fit the budget
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy
+import pybullet
+import rospkg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gait_ctrller import find_library, pd_torque
+from param_sweep import load_defaults, code_version
+from reset_snapshot import SettledSnapshot
+from scheduler import TickScheduler
+from sim_world import motor_id_list, read_robot_state
+from tick_profiler import TickProfiler
+from vec_env import QuadrupedVecEnv
+
+
+# seconds of trotting before the snapshot the benchmarks start from
+warmup_seconds = 1.0
+warmup_vel = [0.5, 0.0, 0.0]
+
+
+def make_calls(env):
+    # (name, func, calls per control tick, calls per round), calls per tick is
+    # None for the calls that are not part of the tick, calls per round None
+    # takes --number
+    client = env.clients[0]
+    body_id = env.body_ids[0]
+    ctrl = env.ctrls[0]
+    joint_target = env.joint_target[0]
+    torque = env.torque[0]
+    imu_data, leg_data = ctrl.imu_data, ctrl.leg_data
+    mpc_share = 1.0 / env.mpc_period
+
+    def read_state():
+        read_robot_state(client, body_id, env.last_vel[0], env.freq, imu_data, leg_data)
+
+    def set_torque():
+        client.setJointMotorControlArray(bodyUniqueId=body_id, jointIndices=motor_id_list,
+                                         controlMode=pybullet.TORQUE_CONTROL, forces=torque)
+
+    # calls that advance the world run once per round. the mpc is solved on
+    # every other toque_calculator() only, so its rounds span whole solve cycles
+    return [("ctypes_call", lambda: ctrl.set_robot_vel(warmup_vel), None, None),
+            ("getBasePositionAndOrientation",
+             lambda: client.getBasePositionAndOrientation(body_id), 1.0, None),
+            ("getBaseVelocity", lambda: client.getBaseVelocity(body_id), 1.0, None),
+            ("getJointStates", lambda: client.getJointStates(body_id, motor_id_list), 1.0, None),
+            ("read_robot_state", read_state, None, None),
+            ("toque_calculator", lambda: ctrl.toque_calculator(imu_data, leg_data),
+             mpc_share, 10),
+            ("get_zebra_joint_control", ctrl.get_zebra_joint_control, mpc_share, None),
+            ("pd_torque", lambda: pd_torque(joint_target, leg_data), 1.0, None),
+            ("setJointMotorControlArray", set_torque, 1.0, None),
+            ("stepSimulation", client.stepSimulation, 1.0, 1)]
+
+
+def time_call(func, snapshot, number, repeat):
+    # per call seconds of every round, the snapshot is restored before each
+    # round so calls that advance the world or the controller see the same state
+    rounds = numpy.zeros(repeat)
+    timer = time.perf_counter
+    for r in range(repeat):
+        snapshot.restore()
+        start = timer()
+        for _ in range(number):
+            func()
+        rounds[r] = (timer() - start) / number
+    return rounds
+
+
+def time_ticks(env, snapshot, ticks):
+    # the stages of walking_simulation's tick in the loop, as in the regression suite
+    snapshot.restore()
+    scheduler = TickScheduler(env.freq, 0)
+    scheduler.add("sim_read", env.read_states)
+    scheduler.add("mpc", env.update_mpc, env.mpc_freq)
+    scheduler.add("pd", env.apply_torque)
+    scheduler.add("step", env.step_physics)
+    scheduler.tick = env.tick
+    profiler = TickProfiler(scheduler, window=ticks)
+    for _ in range(ticks):
+        scheduler.step()
+    return profiler.summary()
+
+
+def run(so_file, path, params, args):
+    env = QuadrupedVecEnv(so_file, 1, terrain=args.terrain, path=path,
+                          freq=params["freq"], mpc_freq=params["mpc_freq"],
+                          pid=[params["stand_kp"], params["stand_kd"],
+                               params["joint_kp"], params["joint_kd"]],
+                          lateral_friction=params["lateralFriction"],
+                          spinning_friction=params["spinningFriction"],
+                          separate_clients=True, seed=params["terrain_seed"])
+    try:
+        env.set_gait_type(0)
+        env.set_robot_vel(warmup_vel)
+        env.step(int(round(warmup_seconds * env.freq)))
+        snapshot = SettledSnapshot(env.clients, env.ctrls)
+        snapshot.capture()
+        budget_us = 1e6 / env.freq
+
+        calls = {}
+        for name, func, per_tick, number in make_calls(env):
+            number = number or args.number
+            rounds = time_call(func, snapshot, number, args.repeat) * 1e6
+            result = {"number": number, "repeat": args.repeat,
+                      "min_us": float(rounds.min()),
+                      "p50_us": float(numpy.percentile(rounds, 50)),
+                      "p99_us": float(numpy.percentile(rounds, 99)),
+                      "mean_us": float(rounds.mean())}
+            if per_tick is not None:
+                result["calls_per_tick"] = per_tick
+                result["per_tick_us"] = per_tick * result["mean_us"]
+                result["budget_fraction"] = result["per_tick_us"] / budget_us
+            calls[name] = result
+
+        stages = {}
+        for name, count, p50, p99, max_us, mean, _ in time_ticks(env, snapshot, args.ticks):
+            stages[name] = {"count": count, "p50_us": float(p50), "p99_us": float(p99),
+                            "max_us": float(max_us), "mean_us": float(mean),
+                            "budget_fraction": float(mean / budget_us)}
+        snapshot.clear()
+    finally:
+        env.close()
+
+    return {"meta": {"freq": env.freq, "mpc_freq": env.mpc_freq, "terrain": args.terrain,
+                     "budget_us": budget_us, "code_version": code_version(path),
+                     "pybullet_api": pybullet.getAPIVersion(),
+                     "python": platform.python_version(), "machine": platform.node()},
+            "calls": calls,
+            "stages": stages}
+
+
+def check(results, baseline, args):
+    # (description, passed) of every threshold
+    checks = []
+    budget_us = results["meta"]["budget_us"]
+    tick = results["stages"]["tick"]
+    checks.append(("tick p99 %.1f us within %.0f%% of the %.0f us budget"
+                   % (tick["p99_us"], 100 * args.budget_fraction, budget_us),
+                   bool(tick["p99_us"] <= args.budget_fraction * budget_us)))
+    if baseline is None:
+        return checks
+    # p50 of the rounds, the mean follows the scheduling noise of the machine
+    for group in ("calls", "stages"):
+        for name, result in results[group].items():
+            old = baseline.get(group, {}).get(name)
+            if old is None or old["p50_us"] <= 0:
+                continue
+            ratio = result["p50_us"] / old["p50_us"]
+            checks.append(("%s p50 %.2fx of baseline" % (name, ratio),
+                           bool(ratio <= 1.0 + args.max_slowdown)))
+    return checks
+
+
+def print_report(results):
+    budget_us = results["meta"]["budget_us"]
+    print("budget %.0f us per tick at %.0f Hz, mpc at %.0f Hz"
+          % (budget_us, results["meta"]["freq"], results["meta"]["mpc_freq"]))
+    print("%-30s %9s %9s %9s %12s %8s" % ("call", "p50 us", "p99 us", "min us",
+                                          "per tick us", "budget"))
+    for name, r in results["calls"].items():
+        if "per_tick_us" in r:
+            tail = "%12.1f %7.1f%%" % (r["per_tick_us"], 100 * r["budget_fraction"])
+        else:
+            tail = "%12s %8s" % ("-", "-")
+        print("%-30s %9.1f %9.1f %9.1f %s" % (name, r["p50_us"], r["p99_us"], r["min_us"], tail))
+    print("%-30s %9s %9s %9s %12s %8s" % ("stage", "p50 us", "p99 us", "max us",
+                                          "mean us", "budget"))
+    for name, r in results["stages"].items():
+        print("%-30s %9.1f %9.1f %9.1f %12.1f %7.1f%%" % (name, r["p50_us"], r["p99_us"],
+                                                          r["max_us"], r["mean_us"],
+                                                          100 * r["budget_fraction"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the calls of the control tick")
+    parser.add_argument("--terrain", default="plane")
+    parser.add_argument("--number", type=int, default=100, help="calls per round")
+    parser.add_argument("--repeat", type=int, default=200, help="rounds per call")
+    parser.add_argument("--ticks", type=int, default=2500, help="ticks of the stage benchmark")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of a previous run to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=0.25,
+                        help="allowed p50 increase relative to the baseline")
+    parser.add_argument("--budget-fraction", type=float, default=1.0,
+                        help="share of 1 / freq the tick p99 may take")
+    parser.add_argument("--so", help="path of libquadruped_ctrl.so")
+    args = parser.parse_args()
+
+    path = rospkg.RosPack().get_path('quadruped_ctrl')
+    so_file = args.so or find_library(path)
+    params = load_defaults(path)
+
+    results = run(so_file, path, params, args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    checks = check(results, baseline, args)
+    results["checks"] = [{"check": text, "passed": ok} for text, ok in checks]
+    results["passed"] = all(ok for _, ok in checks)
+
+    # the controller prints to stdout as well, so the json only goes to a file
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    print_report(results)
+    for text, ok in checks:
+        if not ok:
+            print("FAIL " + text)
+    print("PASS" if results["passed"] else "FAIL")
+    sys.exit(0 if results["passed"] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import numpy
+
+
+# pose of the head camera in the base frame: 0.25 m ahead of the base, the
+# optical axis z looks forward and 30 degrees down, x points to the right
+CAMERA_MOUNT = numpy.array([[0.0, -0.5, numpy.sqrt(3.0) / 2.0, 0.25],
+                            [-1.0, 0.0, 0.0, 0.0],
+                            [0.0, -numpy.sqrt(3.0) / 2.0, -0.5, 0.0],
+                            [0.0, 0.0, 0.0, 1.0]])
+
+
+def matrix_to_quaternion(rot):
+    # xyzw of a 3x3 rotation matrix, from the largest of the four terms so
+    # the division stays well conditioned
+    trace = rot[0, 0] + rot[1, 1] + rot[2, 2]
+    if trace > 0:
+        s = 2.0 * numpy.sqrt(trace + 1.0)
+        return numpy.array([(rot[2, 1] - rot[1, 2]) / s, (rot[0, 2] - rot[2, 0]) / s,
+                            (rot[1, 0] - rot[0, 1]) / s, 0.25 * s])
+    i = int(numpy.argmax(numpy.diagonal(rot)))
+    j, k = (i + 1) % 3, (i + 2) % 3
+    s = 2.0 * numpy.sqrt(1.0 + rot[i, i] - rot[j, j] - rot[k, k])
+    q = numpy.empty(4)
+    q[i] = 0.25 * s
+    q[j] = (rot[j, i] + rot[i, j]) / s
+    q[k] = (rot[k, i] + rot[i, k]) / s
+    q[3] = (rot[k, j] - rot[j, k]) / s
+    return q
+
+
+def quaternion_multiply(a, b, out):
+    # xyzw of the rotation b followed by a
+    ax, ay, az, aw = a
+    bx, by, bz, bw = b
+    out[0] = aw * bx + ax * bw + ay * bz - az * by
+    out[1] = aw * by - ax * bz + ay * bw + az * bx
+    out[2] = aw * bz + ax * by - ay * bx + az * bw
+    out[3] = aw * bw - ax * bx - ay * by - az * bz
+    return out
+
+
+class CameraPose(object):
+    # world pose of the camera from the base pose. the mount transform and
+    # its quaternion are computed once, update() only fills preallocated
+    # arrays: the 4x4 pose, the eye and the target one meter along the
+    # optical axis, and the camera orientation as a quaternion
+    def __init__(self, mount=CAMERA_MOUNT):
+        self.mount = numpy.array(mount, numpy.float64)
+        self.mount_quat = matrix_to_quaternion(self.mount[0:3, 0:3])
+        self.base = numpy.eye(4)
+        self.pose = numpy.eye(4)
+        self.eye = self.pose[0:3, 3]
+        self.target = numpy.zeros(3)
+        self.quat = numpy.zeros(4)
+
+    def update(self, base_pos, base_orn, base_matrix):
+        # base_matrix is the row major 3x3 rotation of base_orn (xyzw), as
+        # getMatrixFromQuaternion returns it
+        base = self.base
+        base[0:3, 0:3] = numpy.reshape(base_matrix, (3, 3))
+        base[0:3, 3] = base_pos
+        numpy.dot(base, self.mount, out=self.pose)
+        numpy.add(self.pose[0:3, 2], self.eye, out=self.target)
+        quaternion_multiply(base_orn, self.mount_quat, self.quat)
@@ -0,0 +1,103 @@
+import os
+import time
+import ctypes
+import signal
+import multiprocessing
+import numpy
+import rospy
+import pybullet
+import pybullet_data
+from pybullet_utils import bullet_client
+
+from sim_world import load_terrain, load_robot, motor_id_list
+from sim_camera import CameraPublisher
+from transport import SlotBusy
+
+
+class SharedRobotState(object):
+    # base pose and joint positions mirrored from the control loop into the
+    # camera process, guarded by a sequence counter that is odd while written
+    SIZE = 1 + 3 + 4 + 12
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.buf = numpy.frombuffer(raw, dtype=numpy.float64)
+
+    def write(self, base_pos, base_orn, joint_pos):
+        buf = self.buf
+        buf[0] += 1
+        buf[1:4] = base_pos
+        buf[4:8] = base_orn
+        buf[8:20] = joint_pos
+        buf[0] += 1
+
+    def read(self, out, timeout=0.1):
+        # retries back off as in LocalTransport.read, SlotBusy after timeout
+        # seconds in the middle of a write means the writer died
+        buf = self.buf
+        deadline = None
+        delay = 0.0
+        while True:
+            seq = buf[0]
+            if seq % 2 == 0:
+                out[:] = buf[1:]
+                if buf[0] == seq:
+                    return seq
+            now = time.time()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise SlotBusy("robot state is still being written after %.3f s" % timeout)
+            time.sleep(delay)
+            delay = min(2 * delay or 1e-5, 1e-3)
+
+
+def exit_with_parent():
+    # linux sends SIGTERM when the parent dies, rospy shuts the node down on
+    # it. elsewhere the loop below notices the new parent pid
+    try:
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        libc.prctl(1, int(signal.SIGTERM))  # PR_SET_PDEATHSIG
+    except (OSError, AttributeError):
+        pass
+
+
+def camera_worker(raw_state, world_args, spinning_friction, camera_args, freq, parent_pid):
+    rospy.init_node('quadruped_camera', anonymous=True)
+    exit_with_parent()
+    client = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+    client.setAdditionalSearchPath(pybullet_data.getDataPath())
+    load_terrain(client, **world_args)
+    body_id = load_robot(client, spinning_friction)
+    camera_pub = CameraPublisher(client, body_id, **camera_args)
+
+    state = SharedRobotState(raw_state)
+    robot_state = numpy.zeros(SharedRobotState.SIZE - 1)
+    last_seq = -1
+    rate = rospy.Rate(freq)
+    while not rospy.is_shutdown() and os.getppid() == parent_pid:
+        try:
+            seq = state.read(robot_state)
+        except SlotBusy as e:
+            rospy.logwarn_throttle(1.0, str(e))
+            continue
+        if seq != last_seq:
+            last_seq = seq
+            client.resetBasePositionAndOrientation(body_id, robot_state[0:3], robot_state[3:7])
+            for j in range(12):
+                client.resetJointState(body_id, motor_id_list[j], robot_state[7+j])
+            camera_pub.update()
+        rate.sleep()
+
+
+def start_camera_worker(world_args, spinning_friction, camera_args, freq):
+    # the worker owns its own DIRECT physics client, so rendering never holds
+    # the GIL or the physics server of the control loop
+    ctx = multiprocessing.get_context("spawn")
+    raw_state = ctx.RawArray('d', SharedRobotState.SIZE)
+    process = ctx.Process(target=camera_worker, name="quadruped_camera",
+                          args=(raw_state, world_args, spinning_friction, camera_args, freq,
+                                os.getpid()))
+    process.daemon = True
+    process.start()
+    return SharedRobotState(raw_state), process
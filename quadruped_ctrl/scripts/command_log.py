@@ -0,0 +1,136 @@
+import csv
+import threading
+import collections
+
+
+# command names, the values of "vel" are the three values handed to
+# set_robot_vel, "gait" and "mode" carry the service cmd. "reset" has no
+# values, it is the reset of the robot after the tick it was logged on
+COMMANDS = ("vel", "gait", "mode", "reset")
+
+
+class CommandLog(object):
+    # external commands with the simulation tick they took effect on, ticks
+    # count from the start of the settle in reset_robot() and go back on
+    # every reset, the log keeps the order they were recorded in
+    def __init__(self, commands=None):
+        self.commands = list(commands or [])
+        self.lock = threading.Lock()
+
+    def record(self, tick, name, values):
+        with self.lock:
+            self.commands.append((tick, name, list(values)))
+
+    def save(self, path):
+        with self.lock:
+            commands = list(self.commands)
+        with open(path, "w") as f:
+            writer = csv.writer(f)
+            writer.writerow(["tick", "command", "values"])
+            for tick, name, values in commands:
+                writer.writerow([tick, name] + values)
+
+
+def load_commands(path):
+    commands = []
+    with open(path) as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            if row[1] not in COMMANDS:
+                raise ValueError("unknown command " + row[1] + " in " + path)
+            commands.append((int(row[0]), row[1], [float(v) for v in row[2:]]))
+    return commands
+
+
+def _sort_episodes(commands):
+    # sorted by tick between the resets, a reset starts the ticks over
+    episodes = [[]]
+    for command in commands:
+        episodes[-1].append(command)
+        if command[1] == "reset":
+            episodes.append([])
+    ordered = []
+    for episode in episodes:
+        ordered.extend(sorted(episode, key=lambda command: command[0]))
+    return ordered
+
+
+class CommandPlayer(object):
+    # applies logged commands on the tick they were recorded, target is a
+    # GaitCtrller or a QuadrupedVecEnv. a logged reset stops apply() until
+    # the caller saw reset_due() and reset the robot
+    def __init__(self, commands):
+        self.commands = _sort_episodes(commands)
+        self.index = 0
+
+    def reset(self):
+        self.index = 0
+
+    def reset_due(self, tick):
+        # True when the robot has to be reset before tick, the commands after
+        # the reset are applied from then on
+        commands = self.commands
+        if self.index < len(commands) and commands[self.index][1] == "reset" \
+                and commands[self.index][0] <= tick:
+            self.index += 1
+            return True
+        return False
+
+    def apply(self, tick, target):
+        commands = self.commands
+        while self.index < len(commands) and commands[self.index][0] <= tick \
+                and commands[self.index][1] != "reset":
+            _, name, values = commands[self.index]
+            if name == "vel":
+                target.set_robot_vel(values)
+            elif name == "gait":
+                target.set_gait_type(int(values[0]))
+            else:
+                target.set_robot_mode(int(values[0]))
+            self.index += 1
+
+    @property
+    def last_tick(self):
+        return self.commands[-1][0] if self.commands else 0
+
+
+class CommandQueue(object):
+    # commands of the transport threads, applied by the loop at a tick
+    # boundary so the controller is only ever called from one thread. the
+    # velocity is coalesced to the latest one, gait and mode changes keep
+    # their order in a bounded deque that drops the oldest when full. a deque
+    # append/popleft and an attribute swap are atomic, no lock is taken
+    def __init__(self, maxlen=16):
+        self.changes = collections.deque(maxlen=maxlen)
+        self.vel = None
+        self.applied_vel = None
+
+    # the setters of GaitCtrller, so the queue stands in for the controller
+    def set_robot_vel(self, vel):
+        self.vel = tuple(vel)
+
+    def set_gait_type(self, gait_type):
+        self.changes.append(("gait", int(gait_type)))
+
+    def set_robot_mode(self, mode):
+        self.changes.append(("mode", int(mode)))
+
+    def drain(self, target, tick=0, log=None):
+        # applies what arrived since the last drain, gait and mode changes
+        # first, then the latest velocity. log gets the tick they took effect
+        changes = self.changes
+        while changes:
+            name, value = changes.popleft()
+            if name == "gait":
+                target.set_gait_type(value)
+            else:
+                target.set_robot_mode(value)
+            if log is not None:
+                log.record(tick, name, [value])
+        vel = self.vel
+        if vel is not self.applied_vel:
+            self.applied_vel = vel
+            target.set_robot_vel(vel)
+            if log is not None:
+                log.record(tick, "vel", vel)
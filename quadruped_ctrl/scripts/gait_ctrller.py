@@ -0,0 +1,242 @@
+import os
+import ctypes
+import numpy
+
+
+N_Motors = 12
+
+# scaling of the zebra kp/kd rows for the simulated motors
+ZEBRA_SCALE = numpy.array([[1.0], [1.0], [1.0/100], [1.0/5], [1.0]])
+
+c_double_p = ctypes.POINTER(ctypes.c_double)
+
+
+class StructPointer(ctypes.Structure):
+    _fields_ = [("eff", ctypes.c_double * 12)]
+
+
+class ZebraPointer(ctypes.Structure):
+    _fields_ = [("position", ctypes.c_double * 12),("velocity", ctypes.c_double * 12),
+    ("kp", ctypes.c_double * 12),("kd", ctypes.c_double * 12),
+    ("effort", ctypes.c_double * 12)]
+
+
+def as_double_p(array):
+    return array.ctypes.data_as(c_double_p)
+
+
+def pd_torque(joint_target, leg_data):
+    # kp * (q_des - q) + kd * (qd_des - qd) + effort, joint_target is (..., 5, 12)
+    # and leg_data (..., 24) so a batch of robots works the same way
+    leg = numpy.reshape(leg_data, joint_target.shape[:-2] + (2, N_Motors))
+    return (joint_target[..., 2:4, :] * (joint_target[..., 0:2, :] - leg)).sum(-2) \
+        + joint_target[..., 4, :]
+
+
+def find_library(package_path):
+    so_file = package_path.replace('src/quadruped_ctrl',
+                                   'devel/lib/libquadruped_ctrl.so')
+    if(not os.path.exists(so_file)):
+        so_file = package_path.replace('src/quadruped_ctrl',
+                                       'build/lib/libquadruped_ctrl.so')
+    return so_file
+
+
+_libraries = {}
+
+
+def load_library(so_file):
+    # the library is loaded and typed once per process
+    lib = _libraries.get(so_file)
+    if lib is not None:
+        return lib
+    lib = ctypes.cdll.LoadLibrary(so_file)
+    lib.init_controller.argtypes = [ctypes.c_double, c_double_p]
+    lib.init_controller.restype = None
+    lib.pre_work.argtypes = [c_double_p, c_double_p]
+    lib.pre_work.restype = None
+    lib.set_gait_type.argtypes = [ctypes.c_int]
+    lib.set_gait_type.restype = None
+    lib.set_robot_mode.argtypes = [ctypes.c_int]
+    lib.set_robot_mode.restype = None
+    lib.set_robot_vel.argtypes = [c_double_p]
+    lib.set_robot_vel.restype = None
+    lib.toque_calculator.argtypes = [c_double_p, c_double_p]
+    lib.toque_calculator.restype = ctypes.POINTER(StructPointer)
+    lib.get_zebra_joint_control.argtypes = []
+    lib.get_zebra_joint_control.restype = ctypes.POINTER(ZebraPointer)
+    lib.controller_state_size.argtypes = []
+    lib.controller_state_size.restype = ctypes.c_int
+    lib.save_controller_state.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.save_controller_state.restype = ctypes.c_int
+    lib.load_controller_state.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.load_controller_state.restype = ctypes.c_int
+
+    # handle based api
+    lib.create_controller.argtypes = [ctypes.c_double, c_double_p]
+    lib.create_controller.restype = ctypes.c_void_p
+    lib.init_controller_h.argtypes = [ctypes.c_void_p, ctypes.c_double, c_double_p]
+    lib.init_controller_h.restype = None
+    lib.destroy_controller.argtypes = [ctypes.c_void_p]
+    lib.destroy_controller.restype = None
+    lib.pre_work_h.argtypes = [ctypes.c_void_p, c_double_p, c_double_p]
+    lib.pre_work_h.restype = None
+    lib.set_gait_type_h.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.set_gait_type_h.restype = None
+    lib.set_robot_mode_h.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.set_robot_mode_h.restype = None
+    lib.set_robot_vel_h.argtypes = [ctypes.c_void_p, c_double_p]
+    lib.set_robot_vel_h.restype = None
+    lib.toque_calculator_h.argtypes = [ctypes.c_void_p, c_double_p, c_double_p]
+    lib.toque_calculator_h.restype = ctypes.POINTER(StructPointer)
+    lib.get_zebra_joint_control_h.argtypes = [ctypes.c_void_p]
+    lib.get_zebra_joint_control_h.restype = ctypes.POINTER(ZebraPointer)
+    lib.get_joint_eff_h.argtypes = [ctypes.c_void_p]
+    lib.get_joint_eff_h.restype = ctypes.POINTER(StructPointer)
+    lib.get_zebra_h.argtypes = [ctypes.c_void_p]
+    lib.get_zebra_h.restype = ctypes.POINTER(ZebraPointer)
+    lib.controller_state_size_h.argtypes = [ctypes.c_void_p]
+    lib.controller_state_size_h.restype = ctypes.c_int
+    lib.save_controller_state_h.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]
+    lib.save_controller_state_h.restype = ctypes.c_int
+    lib.load_controller_state_h.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]
+    lib.load_controller_state_h.restype = ctypes.c_int
+    _libraries[so_file] = lib
+    return lib
+
+
+class GaitCtrller(object):
+    # typed wrapper of libquadruped_ctrl.so, the imu/leg/vel buffers are
+    # allocated once and handed to the library by pointer, the results are
+    # numpy views of the static structs inside the library
+    def __init__(self, so_file):
+        self.lib = load_library(so_file)
+        self._init_buffers()
+        self._bind_results(StructPointer.in_dll(self.lib, "jointEff"),
+                           ZebraPointer.in_dll(self.lib, "joint_control"))
+
+    def _init_buffers(self, imu_data=None, leg_data=None):
+        # imu_data/leg_data may be rows of a batch array shared with the caller
+        self.imu_data = numpy.zeros(10) if imu_data is None else imu_data
+        self.leg_data = numpy.zeros(24) if leg_data is None else leg_data
+        self.vel = numpy.zeros(3)
+        self.pid = numpy.zeros(4)
+        self._imu_p = as_double_p(self.imu_data)
+        self._leg_p = as_double_p(self.leg_data)
+        self._vel_p = as_double_p(self.vel)
+        self._pid_p = as_double_p(self.pid)
+
+    def _bind_results(self, eff, zebra):
+        self._eff = eff
+        self.tau = numpy.ctypeslib.as_array(eff.eff)
+        # rows: position, velocity, kp, kd, effort
+        self._zebra = zebra
+        self.zebra = numpy.frombuffer(zebra, dtype=numpy.float64).reshape(5, N_Motors)
+
+    def _set_state(self, imu_data, leg_data):
+        if imu_data is not self.imu_data:
+            self.imu_data[:] = imu_data
+        if leg_data is not self.leg_data:
+            self.leg_data[:] = leg_data
+
+    def init_controller(self, freq, pid):
+        self.pid[:] = pid
+        self.lib.init_controller(freq, self._pid_p)
+
+    def pre_work(self, imu_data, leg_data):
+        self._set_state(imu_data, leg_data)
+        self.lib.pre_work(self._imu_p, self._leg_p)
+
+    def set_gait_type(self, gait_type):
+        self.lib.set_gait_type(gait_type)
+
+    def set_robot_mode(self, mode):
+        self.lib.set_robot_mode(mode)
+
+    def set_robot_vel(self, vel):
+        self.vel[:] = vel
+        self.lib.set_robot_vel(self._vel_p)
+
+    def toque_calculator(self, imu_data, leg_data):
+        self._set_state(imu_data, leg_data)
+        self.lib.toque_calculator(self._imu_p, self._leg_p)
+        return self.tau
+
+    def get_zebra_joint_control(self):
+        self.lib.get_zebra_joint_control()
+        return self.zebra
+
+    def state_size(self):
+        return self.lib.controller_state_size()
+
+    def save_state(self, buf=None):
+        # flat uint8 copy of the controller state, buf is reused when given
+        if buf is None:
+            buf = numpy.empty(self.state_size(), dtype=numpy.uint8)
+        if self.lib.save_controller_state(buf.ctypes.data, buf.size) < 0:
+            raise ValueError("buffer of " + str(buf.size) + " bytes is too small for the controller state")
+        return buf
+
+    def load_state(self, buf):
+        if self.lib.load_controller_state(buf.ctypes.data, buf.size) < 0:
+            raise ValueError("buffer does not hold a state of this controller")
+
+
+class GaitCtrllerHandle(GaitCtrller):
+    # one independent controller of the handle based api, any number of them
+    # can be stepped in lockstep from one thread
+    def __init__(self, so_file, freq, pid, imu_data=None, leg_data=None):
+        self.lib = load_library(so_file)
+        self._init_buffers(imu_data, leg_data)
+        self.pid[:] = pid
+        self.handle = self.lib.create_controller(freq, self._pid_p)
+        self._bind_results(self.lib.get_joint_eff_h(self.handle).contents,
+                           self.lib.get_zebra_h(self.handle).contents)
+
+    def init_controller(self, freq, pid):
+        self.pid[:] = pid
+        self.lib.init_controller_h(self.handle, freq, self._pid_p)
+
+    def destroy(self):
+        if self.handle is not None:
+            self.lib.destroy_controller(self.handle)
+            self.handle = None
+            self.tau = None
+            self.zebra = None
+
+    def pre_work(self, imu_data, leg_data):
+        self._set_state(imu_data, leg_data)
+        self.lib.pre_work_h(self.handle, self._imu_p, self._leg_p)
+
+    def set_gait_type(self, gait_type):
+        self.lib.set_gait_type_h(self.handle, gait_type)
+
+    def set_robot_mode(self, mode):
+        self.lib.set_robot_mode_h(self.handle, mode)
+
+    def set_robot_vel(self, vel):
+        self.vel[:] = vel
+        self.lib.set_robot_vel_h(self.handle, self._vel_p)
+
+    def toque_calculator(self, imu_data, leg_data):
+        self._set_state(imu_data, leg_data)
+        self.lib.toque_calculator_h(self.handle, self._imu_p, self._leg_p)
+        return self.tau
+
+    def get_zebra_joint_control(self):
+        self.lib.get_zebra_joint_control_h(self.handle)
+        return self.zebra
+
+    def state_size(self):
+        return self.lib.controller_state_size_h(self.handle)
+
+    def save_state(self, buf=None):
+        if buf is None:
+            buf = numpy.empty(self.state_size(), dtype=numpy.uint8)
+        if self.lib.save_controller_state_h(self.handle, buf.ctypes.data, buf.size) < 0:
+            raise ValueError("buffer of " + str(buf.size) + " bytes is too small for the controller state")
+        return buf
+
+    def load_state(self, buf):
+        if self.lib.load_controller_state_h(self.handle, buf.ctypes.data, buf.size) < 0:
+            raise ValueError("buffer does not hold a state of this controller")
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+from xml.etree import ElementTree
+from pybullet_utils import gazebo_world_parser
+
+
+def write_collision_sdf(sdf_file, out_dir):
+    # copy of a model.sdf without its visual elements, loadSDF then skips the
+    # visual meshes and textures. the mesh uris are relative to the working
+    # directory, so the copy can live anywhere
+    tree = ElementTree.parse(sdf_file)
+    for link in tree.getroot().iter("link"):
+        for visual in link.findall("visual"):
+            link.remove(visual)
+    out_file = os.path.join(out_dir, sdf_file.replace(os.sep, "_"))
+    tree.write(out_file)
+    return out_file
+
+
+class CollisionOnlyClient(object):
+    # forwards everything to the client, loadSDF loads the collision-only
+    # copy of the model. the racetrack bodies share a few models, each is
+    # copied once
+    def __init__(self, client, out_dir):
+        self._client = client
+        self._out_dir = out_dir
+        self._copies = {}
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def loadSDF(self, sdf_file, *args, **kwargs):
+        copy = self._copies.get(sdf_file)
+        if copy is None:
+            copy = self._copies[sdf_file] = write_collision_sdf(sdf_file, self._out_dir)
+        return self._client.loadSDF(copy, *args, **kwargs)
+
+
+def load_gazebo_world(client, world_file, visual=True):
+    # builds the world of a gazebo .world file. visual=False is for clients
+    # that never render: the bodies get the same collision shapes, poses and
+    # dynamics but no visual meshes, which is most of the load time
+    if visual:
+        gazebo_world_parser.parseWorld(client, filepath=world_file)
+        return
+    out_dir = tempfile.mkdtemp(prefix="quadruped_world_")
+    try:
+        gazebo_world_parser.parseWorld(CollisionOnlyClient(client, out_dir),
+                                       filepath=world_file)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
@@ -0,0 +1,53 @@
+import numpy
+import rospy
+from rospy.numpy_msg import numpy_msg
+from zebra_msgs.msg import ZebraJointControl, ZebraJointState
+
+from gait_ctrller import N_Motors
+
+
+# rows of the controller's (5, 12) zebra output, in the order of the message
+CONTROL_FIELDS = ("position", "velocity", "kp", "kd", "effort")
+STATE_FIELDS = ("position", "velocity", "effort")
+
+
+class JointStream(object):
+    # publishes ZebraJointControl and ZebraJointState from float32 buffers.
+    # sample() copies one tick into the next row of the buffers and every
+    # ticks_per_msg samples both messages go out, each array then holds
+    # ticks_per_msg * 12 values, tick after tick. the messages are numpy_msg:
+    # their arrays are views of the buffers and serialize with one copy
+    # instead of packing a list, subscribers see the plain message
+    def __init__(self, ticks_per_msg=1, control_topic="/ZebraJointControl",
+                 state_topic="/ZebraJointState"):
+        self.ticks_per_msg = ticks_per_msg
+        self.count = 0
+        self.control = numpy.zeros((len(CONTROL_FIELDS), ticks_per_msg, N_Motors), numpy.float32)
+        self.state = numpy.zeros((len(STATE_FIELDS), ticks_per_msg, N_Motors), numpy.float32)
+
+        control_type = numpy_msg(ZebraJointControl)
+        state_type = numpy_msg(ZebraJointState)
+        self.control_msg = control_type()
+        self.control_msg.enable = numpy.ones(ticks_per_msg * N_Motors, numpy.bool_)
+        for i, field in enumerate(CONTROL_FIELDS):
+            setattr(self.control_msg, field, self.control[i].reshape(-1))
+        self.state_msg = state_type()
+        for i, field in enumerate(STATE_FIELDS):
+            setattr(self.state_msg, field, self.state[i].reshape(-1))
+        self.control_pub = rospy.Publisher(control_topic, control_type, queue_size=10)
+        self.state_pub = rospy.Publisher(state_topic, state_type, queue_size=10)
+
+    def sample(self, joint_control, leg_data, effort):
+        # joint_control is the (5, 12) zebra output, leg_data the joint
+        # positions and velocities, effort the torque applied this tick
+        row = self.count
+        self.control[:, row] = joint_control
+        self.state[0, row] = leg_data[0:N_Motors]
+        self.state[1, row] = leg_data[N_Motors:2 * N_Motors]
+        self.state[2, row] = effort
+        self.count = row + 1
+        if self.count == self.ticks_per_msg:
+            self.count = 0
+            # rospy serializes in publish(), the buffers can be refilled after
+            self.control_pub.publish(self.control_msg)
+            self.state_pub.publish(self.state_msg)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# fan a parameter grid out over a process pool of headless simulations, e.g.
+#   rosrun quadruped_ctrl param_sweep.py --spec sweep.yaml --out results.npz
+# sweep.yaml:
+#   grid:
+#     stand_kp: [80.0, 100.0]
+#     lateralFriction: [0.6, 1.0]
+#     terrain: ["plane", "random1"]
+#     gait: [0, 4]
+#   profile:  # duration [s], vx, vy, wz
+#     - [1.0, 0.0, 0.0, 0.0]
+#     - [3.0, 0.5, 0.0, 0.0]
+
+import os
+import sys
+import csv
+import argparse
+import itertools
+import subprocess
+import concurrent.futures
+import numpy
+import yaml
+import rospkg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gait_ctrller import find_library
+
+
+default_profile = [[1.0, 0.0, 0.0, 0.0],
+                   [3.0, 0.5, 0.0, 0.0],
+                   [2.0, 0.0, 0.0, 0.5],
+                   [2.0, 0.0, 0.0, 0.0]]
+
+metric_names = ["vel_rms_error", "yaw_rate_rms_error", "fallen", "fall_time",
+                "mean_torque_sq", "sim_time"]
+
+fall_height = 0.15
+fall_up_z = 0.5
+
+
+def load_defaults(path):
+    with open(os.path.join(path, "config", "quadruped_ctrl_config.yaml")) as f:
+        config = yaml.safe_load(f)["simulation"]
+    defaults = dict((k, config[k]) for k in
+                    ["terrain", "lateralFriction", "spinningFriction", "freq",
+                     "stand_kp", "stand_kd", "joint_kp", "joint_kd"])
+    defaults["mpc_freq"] = config.get("rates", {}).get("mpc", 100.0)
+    defaults["gait"] = 0
+    defaults["terrain_seed"] = 0
+    return defaults
+
+
+def expand_grid(grid):
+    names = sorted(grid)
+    for values in itertools.product(*[grid[name] for name in names]):
+        yield dict(zip(names, values))
+
+
+def code_version(path):
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"],
+                                       cwd=path, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_config(so_file, path, params, profile):
+    from vec_env import QuadrupedVecEnv
+
+    env = QuadrupedVecEnv(so_file, 1, terrain=params["terrain"], path=path,
+                          freq=params["freq"], mpc_freq=params["mpc_freq"],
+                          pid=[params["stand_kp"], params["stand_kd"],
+                               params["joint_kp"], params["joint_kd"]],
+                          lateral_friction=params["lateralFriction"],
+                          spinning_friction=params["spinningFriction"],
+                          separate_clients=True, seed=params["terrain_seed"])
+    try:
+        env.set_gait_type(int(params["gait"]))
+        freq = params["freq"]
+        vel_err = 0.0
+        yaw_err = 0.0
+        torque_sq = 0.0
+        ticks = 0
+        fallen = False
+        for duration, vx, vy, wz in profile:
+            env.set_robot_vel([vx, vy, wz])
+            for _ in range(int(round(duration * freq))):
+                env.step()
+                ticks += 1
+                x, y, z, w = env.imu_data[0, 3:7]
+                yaw = numpy.arctan2(2*(w*z + x*y), 1 - 2*(y*y + z*z))
+                vel = env.last_vel[0]
+                body_vx = numpy.cos(yaw)*vel[0] + numpy.sin(yaw)*vel[1]
+                body_vy = -numpy.sin(yaw)*vel[0] + numpy.cos(yaw)*vel[1]
+                vel_err += (body_vx - vx)**2 + (body_vy - vy)**2
+                yaw_err += (env.imu_data[0, 9] - wz)**2
+                torque_sq += numpy.dot(env.torque[0], env.torque[0]) / len(env.torque[0])
+                up_z = 1 - 2*(x*x + y*y)
+                if env.base_pos[0, 2] < fall_height or up_z < fall_up_z:
+                    fallen = True
+                    break
+            if fallen:
+                break
+    finally:
+        env.close()
+
+    sim_time = ticks / freq
+    return dict(vel_rms_error=numpy.sqrt(vel_err / max(ticks, 1)),
+                yaw_rate_rms_error=numpy.sqrt(yaw_err / max(ticks, 1)),
+                fallen=fallen,
+                fall_time=sim_time if fallen else -1.0,
+                mean_torque_sq=torque_sq / max(ticks, 1),
+                sim_time=sim_time)
+
+
+def write_results(out, rows, columns):
+    # one column per parameter and metric
+    if out.endswith(".csv"):
+        with open(out, "w") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+    else:
+        numpy.savez(out, **dict((name, numpy.array([row[name] for row in rows]))
+                                for name in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parameter sweep of headless simulations")
+    parser.add_argument("--spec", help="yaml file with the parameter grid and command profile")
+    parser.add_argument("--out", default="sweep_results.npz", help=".npz or .csv results file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--so", help="path of libquadruped_ctrl.so")
+    args = parser.parse_args()
+
+    path = rospkg.RosPack().get_path('quadruped_ctrl')
+    so_file = args.so or find_library(path)
+    spec = {}
+    if args.spec:
+        with open(args.spec) as f:
+            spec = yaml.safe_load(f) or {}
+    defaults = load_defaults(path)
+    profile = spec.get("profile", default_profile)
+    configs = []
+    for overrides in expand_grid(spec.get("grid", {})):
+        params = dict(defaults)
+        params.update(overrides)
+        configs.append(params)
+
+    version = code_version(path)
+    rows = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_config, so_file, path, params, profile) for params in configs]
+        for params, future in zip(configs, futures):
+            row = dict(params)
+            row.update(future.result())
+            row["code_version"] = version
+            rows.append(row)
+            print(" ".join("%s=%s" % (k, row[k]) for k in sorted(row)))
+
+    columns = sorted(configs[0]) + metric_names + ["code_version"]
+    write_results(args.out, rows, columns)
+    print("wrote %d results to %s" % (len(rows), args.out))
+
+
+if __name__ == '__main__':
+    main()
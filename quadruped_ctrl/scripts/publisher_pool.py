@@ -0,0 +1,20 @@
+import rospy
+
+
+class PublisherPool(object):
+    # publishers and their messages are created once at start-up, the
+    # control loop only fills the preallocated message in place
+    def __init__(self):
+        self._entries = {}
+
+    def register(self, name, topic, msg_type, queue_size=10):
+        msg = msg_type()
+        self._entries[name] = [rospy.Publisher(topic, msg_type, queue_size=queue_size), msg]
+        return msg
+
+    def message(self, name):
+        return self._entries[name][1]
+
+    def publish(self, name):
+        entry = self._entries[name]
+        entry[0].publish(entry[1])
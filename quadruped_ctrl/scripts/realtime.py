@@ -0,0 +1,80 @@
+import os
+import time
+import rospy
+
+from tick_profiler import StageStats
+
+
+CATCH_UP = ("skip", "burst")
+
+
+class RealTimeRate(object):
+    # paces the loop on a fixed grid of deadlines. it sleeps until spin
+    # seconds before the deadline and busy-waits the rest, which holds the
+    # period far tighter than a plain sleep. after an overrun "skip" drops the
+    # missed ticks and starts a new grid, "burst" keeps the grid and runs the
+    # missed ticks back to back, up to max_burst ticks behind
+    def __init__(self, hz, spin=0.0002, catch_up="skip", max_burst=10, window=5000):
+        if catch_up not in CATCH_UP:
+            raise ValueError("catch_up is one of " + ", ".join(CATCH_UP))
+        self.period = 1.0 / hz
+        self.spin = spin
+        self.catch_up = catch_up
+        self.max_burst = max_burst
+        self.deadline = None
+        # how late every tick started, the jitter of the loop
+        self.late = StageStats(window)
+        self.skipped = 0
+        self.burst = 0
+
+    def sleep(self):
+        # waits for the next deadline, returns how late it woke up [s]
+        timer = time.perf_counter
+        if self.deadline is None:
+            self.deadline = timer() + self.period
+        deadline = self.deadline
+        remaining = deadline - timer()
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+        while timer() < deadline:
+            pass
+        now = timer()
+        late = now - deadline
+        self.late.record(late)
+
+        behind = int(late / self.period)
+        if behind == 0:
+            self.deadline = deadline + self.period
+        elif self.catch_up == "burst" and behind <= self.max_burst:
+            self.deadline = deadline + self.period
+            self.burst += 1
+        else:
+            self.deadline = now + self.period
+            self.skipped += behind
+        return late
+
+    def report(self):
+        p50, p99 = self.late.percentiles()
+        return ("loop start late p50 %.1f us, p99 %.1f us, max %.1f us, "
+                "%d ticks skipped, %d burst ticks"
+                % (p50 * 1e6, p99 * 1e6, self.late.max * 1e6, self.skipped, self.burst))
+
+
+def set_realtime(cpu=-1, fifo_priority=0):
+    # pins the calling thread to cpu and switches it to SCHED_FIFO, threads
+    # started before keep their setting. returns what could be applied, the
+    # rest needs CAP_SYS_NICE or a matching rtprio limit
+    applied = []
+    if cpu >= 0:
+        try:
+            os.sched_setaffinity(0, {cpu})
+            applied.append("cpu %d" % cpu)
+        except (OSError, ValueError) as e:
+            rospy.logwarn("cannot pin the loop to cpu %d: %s" % (cpu, e))
+    if fifo_priority > 0:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(fifo_priority))
+            applied.append("SCHED_FIFO %d" % fifo_priority)
+        except (OSError, AttributeError) as e:
+            rospy.logwarn("cannot use SCHED_FIFO: %s" % e)
+    return applied
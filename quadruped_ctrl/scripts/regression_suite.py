@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# replay a command log headless on every terrain and compare with a golden run
+#   rosrun quadruped_ctrl regression_suite.py --out golden.npz
+#   rosrun quadruped_ctrl regression_suite.py --golden golden.npz --out run.npz
+# the command log is a csv recorded with simulation/command_record, without
+# --commands the built-in default_commands are replayed. the exit code is 1
+# when the torques or the base trajectory drift or the simulation got slower
+
+import os
+import sys
+import time
+import argparse
+import numpy
+import rospkg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gait_ctrller import find_library
+from command_log import CommandPlayer, load_commands
+from param_sweep import load_defaults, code_version
+from scheduler import TickScheduler
+from tick_profiler import TickProfiler
+from vec_env import QuadrupedVecEnv
+
+
+# (tick, command, values), the settle of the reset ends at tick 200
+default_commands = [(200, "gait", [0]),
+                    (700, "vel", [0.5, 0.0, 0.0]),
+                    (2200, "vel", [0.5, 0.0, 0.5]),
+                    (3200, "vel", [0.0, 0.0, 0.0])]
+
+default_terrains = ["plane", "random1", "stairs"]
+default_seed = 1
+
+
+def run_terrain(so_file, path, params, terrain, commands, seconds):
+    env = QuadrupedVecEnv(so_file, 1, terrain=terrain, path=path,
+                          freq=params["freq"], mpc_freq=params["mpc_freq"],
+                          pid=[params["stand_kp"], params["stand_kd"],
+                               params["joint_kp"], params["joint_kd"]],
+                          lateral_friction=params["lateralFriction"],
+                          spinning_friction=params["spinningFriction"],
+                          separate_clients=True, seed=params["terrain_seed"])
+    try:
+        player = CommandPlayer(commands)
+        # the stages of walking_simulation's tick, timed by the profiler
+        scheduler = TickScheduler(env.freq, 0)
+        scheduler.add("replay", lambda: player.apply(scheduler.tick, env))
+        scheduler.add("sim_read", env.read_states)
+        scheduler.add("mpc", env.update_mpc, env.mpc_freq)
+        scheduler.add("pd", env.apply_torque)
+        scheduler.add("step", env.step_physics)
+        scheduler.tick = env.tick
+        ticks = int(round(seconds * env.freq))
+        profiler = TickProfiler(scheduler, window=ticks)
+
+        torque = numpy.zeros((ticks, env.torque.shape[1]))
+        base_pos = numpy.zeros((ticks, 3))
+        orientation = numpy.zeros((ticks, 4))
+        start = time.perf_counter()
+        for i in range(ticks):
+            scheduler.step()
+            if player.reset_due(scheduler.tick):
+                # between two ticks, as in walking_simulation's loop
+                env.reset()
+                scheduler.tick = env.tick
+            torque[i] = env.torque[0]
+            base_pos[i] = env.base_pos[0]
+            orientation[i] = env.imu_data[0, 3:7]
+        elapsed = time.perf_counter() - start
+    finally:
+        env.close()
+
+    stages = profiler.summary()
+    return {"torque": torque,
+            "base_pos": base_pos,
+            "orientation": orientation,
+            "ticks_per_sec": ticks / elapsed,
+            "stages": numpy.array([row[0] for row in stages]),
+            "stage_p50_us": numpy.array([row[2] for row in stages]),
+            "stage_p99_us": numpy.array([row[3] for row in stages]),
+            "stage_mean_us": numpy.array([row[5] for row in stages])}
+
+
+def _diff(run, golden):
+    # nan where both runs diverged the same way counts as equal, nan on only
+    # one side as infinitely far off
+    diff = numpy.abs(run - golden)
+    same = numpy.isnan(run) & numpy.isnan(golden)
+    diff[same] = 0.0
+    diff[numpy.isnan(diff)] = numpy.inf
+    return diff
+
+
+def compare(terrain, run, golden, args):
+    # returns the report lines and whether the run passes
+    lines = []
+    passed = True
+    n = min(len(run["torque"]), len(golden["torque"]))
+    torque_diff = _diff(run["torque"][:n], golden["torque"][:n])
+    pos_diff = _diff(run["base_pos"][:n], golden["base_pos"][:n]).max(axis=1)
+    drifted = numpy.nonzero(torque_diff.max(axis=1) > args.torque_tol)[0]
+    lines.append("%s: torque max diff %.3g rms %.3g, base max drift %.3g m, final %.3g m"
+                 % (terrain, torque_diff.max(), numpy.sqrt(numpy.mean(torque_diff ** 2)),
+                    pos_diff.max(), pos_diff[-1]))
+    if len(drifted):
+        lines.append("  torque drift from tick %d on" % drifted[0])
+        passed = False
+    diverged = numpy.nonzero(~numpy.isfinite(run["torque"][:n]).all(axis=1))[0]
+    if len(diverged):
+        lines.append("  controller output is not finite from tick %d on" % diverged[0])
+    if pos_diff.max() > args.pos_tol:
+        passed = False
+
+    # wall clock ticks/s of the same code varies by more than 10% between
+    # runs, it is only reported. the timing gate is opt-in and looks at the
+    # per-stage p50, which a few slow ticks do not move
+    speed = run["ticks_per_sec"] / golden["ticks_per_sec"]
+    lines.append("  %.0f ticks/s, %.2fx of golden" % (run["ticks_per_sec"], speed))
+    golden_p50 = dict(zip(golden["stages"], golden["stage_p50_us"]))
+    for name, p50 in zip(run["stages"], run["stage_p50_us"]):
+        if name not in golden_p50 or golden_p50[name] <= 0:
+            continue
+        ratio = p50 / golden_p50[name]
+        slower = args.slowdown is not None and ratio > 1.0 + args.slowdown
+        lines.append("  %-9s p50 %8.1f us, %.2fx of golden%s"
+                     % (name, p50, ratio, " too slow" if slower else ""))
+        if slower:
+            passed = False
+    return lines, passed
+
+
+def load_results(path):
+    results = {}
+    with numpy.load(path) as data:
+        for key in data.files:
+            if "/" not in key:
+                continue
+            terrain, name = key.split("/", 1)
+            results.setdefault(terrain, {})[name] = data[key]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="deterministic replay and regression check")
+    parser.add_argument("--commands", help="command csv recorded with simulation/command_record")
+    parser.add_argument("--terrains", nargs="+", default=default_terrains)
+    parser.add_argument("--seconds", type=float, default=10.0, help="simulated time per terrain")
+    parser.add_argument("--seed", type=int, default=default_seed, help="seed of the random1 terrain")
+    parser.add_argument("--out", default="regression.npz")
+    parser.add_argument("--golden", help="results of a previous run to compare against")
+    parser.add_argument("--torque-tol", type=float, default=1e-6, help="[Nm]")
+    parser.add_argument("--pos-tol", type=float, default=1e-6, help="[m]")
+    parser.add_argument("--slowdown", type=float,
+                        help="fail when a stage p50 is this fraction slower than golden, "
+                             "off by default")
+    parser.add_argument("--so", help="path of libquadruped_ctrl.so")
+    args = parser.parse_args()
+
+    path = rospkg.RosPack().get_path('quadruped_ctrl')
+    so_file = args.so or find_library(path)
+    params = load_defaults(path)
+    params["terrain_seed"] = args.seed
+    commands = load_commands(args.commands) if args.commands else default_commands
+
+    results = {}
+    for terrain in args.terrains:
+        results[terrain] = run_terrain(so_file, path, params, terrain, commands, args.seconds)
+        print("%s: %.0f ticks/s" % (terrain, results[terrain]["ticks_per_sec"]))
+
+    arrays = {"code_version": numpy.array(code_version(path))}
+    for terrain, result in results.items():
+        for name, value in result.items():
+            arrays[terrain + "/" + name] = value
+    numpy.savez(args.out, **arrays)
+    print("wrote results to " + args.out)
+
+    if args.golden:
+        golden = load_results(args.golden)
+        passed = True
+        for terrain, result in results.items():
+            if terrain not in golden:
+                print(terrain + ": not in golden run")
+                continue
+            lines, ok = compare(terrain, result, golden[terrain], args)
+            print("\n".join(lines))
+            passed = passed and ok
+        print("PASS" if passed else "FAIL")
+        sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
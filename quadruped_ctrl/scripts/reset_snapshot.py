@@ -0,0 +1,38 @@
+import numpy
+
+
+class SettledSnapshot(object):
+    # the world right after the robot settled in reset_robot(): a pybullet
+    # saveState per physics client and the saved state of every controller.
+    # restore() rewinds both without stepping the simulation
+    def __init__(self, clients, ctrls):
+        self.clients = clients
+        self.ctrls = ctrls
+        self.state_ids = None
+        self.ctrl_states = None
+        self.arrays = None
+
+    @property
+    def captured(self):
+        return self.state_ids is not None
+
+    def capture(self, **arrays):
+        # arrays are buffers of the caller that belong to the settled state
+        self.state_ids = [client.saveState() for client in self.clients]
+        self.ctrl_states = [ctrl.save_state() for ctrl in self.ctrls]
+        self.arrays = dict((name, numpy.copy(value)) for name, value in arrays.items())
+
+    def restore(self):
+        for client, state_id in zip(self.clients, self.state_ids):
+            client.restoreState(state_id)
+        for ctrl, state in zip(self.ctrls, self.ctrl_states):
+            ctrl.load_state(state)
+        return dict((name, numpy.copy(value)) for name, value in self.arrays.items())
+
+    def clear(self):
+        if self.state_ids is not None:
+            for client, state_id in zip(self.clients, self.state_ids):
+                client.removeState(state_id)
+        self.state_ids = None
+        self.ctrl_states = None
+        self.arrays = None
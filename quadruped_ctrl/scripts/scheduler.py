@@ -0,0 +1,78 @@
+import time
+import rospy
+
+
+class Task(object):
+    def __init__(self, name, func, period, phase, control):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.phase = phase
+        self.control = control
+        self.budget = None
+        self.overruns = 0
+
+
+class TickScheduler(object):
+    # runs every registered task on the simulation tick counter, a task with
+    # period n and phase k runs on the ticks where tick % n == k, so the
+    # schedule only depends on the simulation clock and never on wall time
+    def __init__(self, freq, real_time_factor=1.0):
+        self.freq = freq
+        self.tick = 0
+        self.tasks = []
+        self.overruns = 0
+        self.profiler = None
+        # wall time available per tick, None when free-running
+        if real_time_factor > 0:
+            self.tick_budget = 1.0 / (freq * real_time_factor)
+        else:
+            self.tick_budget = None
+
+    def period_of(self, rate):
+        if rate is None or rate <= 0 or rate >= self.freq:
+            return 1
+        return max(1, int(round(self.freq / rate)))
+
+    def add(self, name, func, rate=None, phase=0, control=False):
+        # rate is in Hz and rounded to a whole number of ticks, None runs the
+        # task every tick, control tasks also run while the robot settles
+        period = self.period_of(rate)
+        task = Task(name, func, period, phase % period, control)
+        if self.tick_budget is not None:
+            task.budget = self.tick_budget * period
+        self.tasks.append(task)
+        return task
+
+    def rate_of(self, name):
+        for task in self.tasks:
+            if task.name == name:
+                return self.freq / task.period
+        return None
+
+    def reset(self):
+        self.tick = 0
+
+    def step(self, control_only=False):
+        tick = self.tick
+        tick_start = time.perf_counter()
+        for task in self.tasks:
+            if tick % task.period != task.phase:
+                continue
+            if control_only and not task.control:
+                continue
+            start = time.perf_counter()
+            task.func()
+            elapsed = time.perf_counter() - start
+            if self.profiler is not None:
+                self.profiler.record(task.name, elapsed)
+            if task.budget is not None and elapsed > task.budget:
+                task.overruns += 1
+                rospy.logwarn_throttle(1.0, "task " + task.name + " overran its period, "
+                                       + str(task.overruns) + " overruns")
+        elapsed = time.perf_counter() - tick_start
+        if self.profiler is not None:
+            self.profiler.record("tick", elapsed)
+        if self.tick_budget is not None and elapsed > self.tick_budget:
+            self.overruns += 1
+        self.tick = tick + 1
@@ -0,0 +1,190 @@
+import numpy
+import rospy
+import tf2_ros
+from geometry_msgs.msg import TransformStamped
+from sensor_msgs.msg import Image
+from sensor_msgs.msg import PointCloud2
+from sensor_msgs.msg import PointField
+
+from camera_pose import CameraPose
+
+
+POINT_FIELDS = [
+    PointField('x', 0, PointField.FLOAT32, 1),
+    PointField('y', 4, PointField.FLOAT32, 1),
+    PointField('z', 8, PointField.FLOAT32, 1)]
+
+
+IMAGE_PIXEL_BYTES = {"mono8": 1, "rgb8": 3, "32FC1": 4}
+
+GREY_WEIGHTS = numpy.array([0.299, 0.587, 0.114])
+
+
+def linearize_depth(depth_img, near, far):
+    # pybullet depth buffer values to metric depth
+    return far * near / (far - (far - near) * depth_img)
+
+
+class DepthProjector(object):
+    # back-projects a whole pybullet depth buffer into a world frame point
+    # cloud, the per-pixel rays only depend on the intrinsics and are cached
+    def __init__(self, width, height, projection_matrix, near, far,
+                 min_range=0.01, max_range=4.0):
+        self.near = near
+        self.far = far
+        self.min_range = min_range
+        self.max_range = max_range
+        fx = (width*projection_matrix[0])/2.0
+        fy = (height*projection_matrix[5])/2.0
+        cx = (1-projection_matrix[2])*width/2.0
+        cy = (1+projection_matrix[6])*height/2.0
+        w, h = numpy.meshgrid(numpy.arange(width), numpy.arange(height))
+        self._ray_x = ((w - cx)/fx).ravel()
+        self._ray_y = ((h - cy)/fy).ravel()
+
+    def project(self, depth_img, transform):
+        # returns an (n, 3) float32 array of the points in range, transformed
+        # by the 4x4 camera pose
+        depth_img = numpy.asarray(depth_img, numpy.float64).ravel()
+        z = linearize_depth(depth_img, self.near, self.far)
+        mask = (z >= self.min_range) & (z <= self.max_range)
+        z = z[mask]
+        points = numpy.empty((z.size, 3))
+        numpy.multiply(self._ray_x[mask], z, out=points[:, 0])
+        numpy.multiply(self._ray_y[mask], z, out=points[:, 1])
+        points[:, 2] = z
+        transform = numpy.asarray(transform)
+        cloud = numpy.dot(points, transform[0:3, 0:3].T)
+        cloud += transform[0:3, 3]
+        return cloud.astype(numpy.float32)
+
+
+def fill_point_cloud(msg, cloud):
+    msg.height = 1
+    msg.width = len(cloud)
+    msg.fields = POINT_FIELDS
+    msg.is_bigendian = False
+    msg.point_step = 12
+    msg.row_step = 12 * len(cloud)
+    msg.is_dense = True
+    msg.data = cloud.tobytes()
+
+
+def fill_image(msg, encoding, width, height, rgb_img, depth_img, near, far):
+    # the pixels are converted with whole array operations and serialized
+    # from one contiguous buffer
+    if encoding == "mono8":
+        rgb = numpy.reshape(rgb_img, (height, width, 4))[:, :, 0:3]
+        # rounded as PIL convert("L") did, the cast alone truncates
+        pixels = numpy.rint(numpy.dot(rgb, GREY_WEIGHTS)).astype(numpy.uint8)
+    elif encoding == "rgb8":
+        rgb = numpy.reshape(rgb_img, (height, width, 4))[:, :, 0:3]
+        pixels = numpy.ascontiguousarray(rgb, numpy.uint8)
+    elif encoding == "32FC1":
+        depth = numpy.reshape(depth_img, (height, width))
+        pixels = linearize_depth(depth, near, far).astype(numpy.float32)
+    else:
+        raise ValueError("unsupported image encoding " + str(encoding))
+    msg.width = width
+    msg.height = height
+    msg.encoding = encoding
+    msg.is_bigendian = False
+    msg.step = width * IMAGE_PIXEL_BYTES[encoding]
+    msg.data = pixels.tobytes()
+
+
+def fill_transform(msg, position, orientation):
+    translation = msg.transform.translation
+    translation.x, translation.y, translation.z = position[0], position[1], position[2]
+    rotation = msg.transform.rotation
+    rotation.x, rotation.y = orientation[0], orientation[1]
+    rotation.z, rotation.w = orientation[2], orientation[3]
+
+
+class CameraPublisher(object):
+    # renders the robot head camera of body_id in the given pybullet client
+    # and publishes the tf frames, the point cloud and the image
+    def __init__(self, client, body_id, width, height, encoding="mono8",
+                 near=0.1, far=1000, clock=None):
+        # clock() returns the simulated time in lockstep mode, None stamps now
+        self.clock = clock
+        self.client = client
+        self.body_id = body_id
+        self.width = width
+        self.height = height
+        self.encoding = encoding
+        self.near = near
+        self.far = far
+        self.camera_pose = CameraPose()
+        self.pub_pointcloud = PointCloud2()
+        self.pub_image = Image()
+        self.pointcloud_publisher = rospy.Publisher("/generated_pc", PointCloud2, queue_size=10)
+        self.image_publisher = rospy.Publisher("/cam0/image_raw", Image, queue_size=10)
+        # the robot, cam and tar frames go out together in one tf message
+        self.tf_broadcaster = tf2_ros.TransformBroadcaster()
+        self.transforms = []
+        for frame in ("robot", "cam", "tar"):
+            transform = TransformStamped()
+            transform.header.frame_id = "world"
+            transform.child_frame_id = frame
+            self.transforms.append(transform)
+
+        aspect = float(width) / float(height)
+        self.projectionMatrix = client.computeProjectionMatrixFOV(60, aspect, near, far)
+        self.projector = DepthProjector(width, height, self.projectionMatrix, near, far)
+        self.pub_pointcloud.header.frame_id = "world"
+        self.pub_image.header.frame_id = "cam"
+
+    def update_pose(self):
+        client = self.client
+        cubePos, cubeOrn = client.getBasePositionAndOrientation(self.body_id)
+        self.camera_pose.update(cubePos, cubeOrn, client.getMatrixFromQuaternion(cubeOrn))
+        self.cubePos = cubePos
+        self.cubeOrn = cubeOrn
+
+    def stamp(self):
+        if self.clock is None:
+            return rospy.Time.now()
+        return rospy.Time.from_sec(self.clock())
+
+    def send_tf(self, stamp):
+        robot, cam, tar = self.transforms
+        pose = self.camera_pose
+        fill_transform(robot, self.cubePos, self.cubeOrn)
+        fill_transform(cam, pose.eye, pose.quat)
+        fill_transform(tar, pose.target, self.cubeOrn)
+        for transform in self.transforms:
+            transform.header.stamp = stamp
+        self.tf_broadcaster.sendTransform(self.transforms)
+
+    def render_image(self, stamp):
+        client = self.client
+        pose = self.camera_pose
+        cameraUpVector = [0, 0, 1]
+        viewMatrix = client.computeViewMatrix(pose.eye, pose.target, cameraUpVector)
+        width, height, rgbImg, depthImg, _ = client.getCameraImage(self.width,
+                                   self.height,
+                                   viewMatrix=viewMatrix,
+                                   projectionMatrix=self.projectionMatrix,
+                                   shadow=1,
+                                   lightDirection=[1, 1, 1],
+                                   renderer=client.ER_BULLET_HARDWARE_OPENGL)
+
+        # point cloud
+        cloud = self.projector.project(depthImg, pose.pose)
+        self.pub_pointcloud.header.stamp = stamp
+        fill_point_cloud(self.pub_pointcloud, cloud)
+        self.pointcloud_publisher.publish(self.pub_pointcloud)
+
+        # image
+        self.pub_image.header.stamp = stamp
+        fill_image(self.pub_image, self.encoding, width, height, rgbImg, depthImg,
+                   self.near, self.far)
+        self.image_publisher.publish(self.pub_image)
+
+    def update(self):
+        # one pose and one stamp for the frames and the images
+        self.update_pose()
+        stamp = self.stamp()
+        self.send_tf(stamp)
+        self.render_image(stamp)
@@ -0,0 +1,58 @@
+import time
+import threading
+import rospy
+
+
+class SimClock(object):
+    # simulated time in physics steps. it never goes back: a reset moves the
+    # robot, not the clock. in lockstep mode publish() sends the time on the
+    # "clock" topic and, with wait_ack, blocks until a participant sent that
+    # time back on "clock_ack", so the simulation runs as fast as the slowest
+    # participant allows
+    def __init__(self, transport, freq, wait_ack=False, warn_after=1.0):
+        self.transport = transport
+        self.dt = 1.0 / freq
+        self.steps = 0
+        self.wait_ack = wait_ack
+        self.warn_after = warn_after
+        self.acked = -1.0
+        self.last_warn = 0.0
+        self.cond = threading.Condition()
+        transport.advertise("clock")
+        if wait_ack:
+            transport.subscribe("clock_ack", self.on_ack)
+
+    def step(self):
+        self.steps += 1
+
+    def now(self):
+        return self.steps * self.dt
+
+    def on_ack(self, values):
+        with self.cond:
+            if values[0] > self.acked:
+                self.acked = values[0]
+            self.cond.notify()
+
+    def publish(self):
+        t = self.now()
+        self.transport.publish("clock", [t], stamp=t)
+        if self.wait_ack:
+            self.wait(t)
+
+    def wait(self, t):
+        # the ack went through a ros time, half a step absorbs the rounding
+        due = t - 0.5 * self.dt
+        start = time.time()
+        while not self.transport.is_shutdown():
+            # inputs of the local transport are only dispatched by poll()
+            self.transport.poll()
+            with self.cond:
+                if self.acked >= due:
+                    return
+                self.cond.wait(1e-4)
+            # throttled on the wall clock, ros time stands still while waiting
+            now = time.time()
+            if now - start >= self.warn_after and now - self.last_warn >= self.warn_after:
+                self.last_warn = now
+                rospy.logwarn("waiting for clock_ack of %.3f s" % t)
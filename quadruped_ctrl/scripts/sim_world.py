@@ -0,0 +1,144 @@
+import os
+import random
+import numpy
+from gazebo_world import load_gazebo_world
+
+
+robot_start_pos = [0, 0, 0.42]
+robot_height = 0.30
+motor_id_list = [0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14]
+init_new_pos = [0.0, -0.8, 1.6, 0.0, -0.8, 1.6, 0.0, -0.8, 1.6, 0.0, -0.8, 1.6,
+                0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+
+
+# client is the pybullet module or a pybullet_utils.bullet_client.BulletClient,
+# so the same world can be built in every physics server. visual=False leaves
+# out the racetrack meshes when nothing is rendered
+def load_terrain(client, terrain, path, lateral_friction, seed=None, gui=False,
+                 visual=True):
+    rng = random.Random(seed)
+    heightPerturbationRange = 0.06
+    numHeightfieldRows = 256
+    numHeightfieldColumns = 256
+    if terrain == "plane":
+        planeShape = client.createCollisionShape(shapeType=client.GEOM_PLANE)
+        ground_id = client.createMultiBody(0, planeShape)
+        client.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0, 0, 1])
+        client.changeDynamics(ground_id, -1, lateralFriction=lateral_friction)
+    elif terrain == "random1":
+        heightfieldData = [0]*numHeightfieldRows*numHeightfieldColumns
+        for j in range(int(numHeightfieldColumns/2)):
+            for i in range(int(numHeightfieldRows/2)):
+                height = rng.uniform(0, heightPerturbationRange)
+                heightfieldData[2*i+2*j*numHeightfieldRows] = height
+                heightfieldData[2*i+1+2*j*numHeightfieldRows] = height
+                heightfieldData[2*i+(2*j+1)*numHeightfieldRows] = height
+                heightfieldData[2*i+1+(2*j+1)*numHeightfieldRows] = height
+        terrainShape = client.createCollisionShape(shapeType=client.GEOM_HEIGHTFIELD, meshScale=[.05, .05, 1], heightfieldTextureScaling=(
+            numHeightfieldRows-1)/2, heightfieldData=heightfieldData, numHeightfieldRows=numHeightfieldRows, numHeightfieldColumns=numHeightfieldColumns)
+        ground_id = client.createMultiBody(0, terrainShape)
+        client.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0, 0, 1])
+        client.changeDynamics(ground_id, -1, lateralFriction=lateral_friction)
+    elif terrain == "random2":
+        terrain_shape = client.createCollisionShape(
+            shapeType=client.GEOM_HEIGHTFIELD,
+            meshScale=[.5, .5, .5],
+            fileName="heightmaps/ground0.txt",
+            heightfieldTextureScaling=128)
+        ground_id = client.createMultiBody(0, terrain_shape)
+        textureId = client.loadTexture(path+"/models/grass.png")
+        client.changeVisualShape(ground_id, -1, textureUniqueId=textureId)
+        client.resetBasePositionAndOrientation(ground_id, [1, 0, 0.2], [0, 0, 0, 1])
+        client.changeDynamics(ground_id, -1, lateralFriction=lateral_friction)
+    elif terrain == "stairs":
+        planeShape = client.createCollisionShape(shapeType=client.GEOM_PLANE)
+        ground_id = client.createMultiBody(0, planeShape)
+        # client.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0.0872, 0, 0.9962])
+        client.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0, 0, 1])
+        # many box
+        colSphereId = client.createCollisionShape(
+            client.GEOM_BOX, halfExtents=[0.1, 0.4, 0.01])
+        colSphereId1 = client.createCollisionShape(
+            client.GEOM_BOX, halfExtents=[0.1, 0.4, 0.02])
+        colSphereId2 = client.createCollisionShape(
+            client.GEOM_BOX, halfExtents=[0.1, 0.4, 0.03])
+        colSphereId3 = client.createCollisionShape(
+            client.GEOM_BOX, halfExtents=[0.1, 0.4, 0.04])
+        # colSphereId4 = client.createCollisionShape(
+        #     client.GEOM_BOX, halfExtents=[0.03, 0.03, 0.03])
+        client.createMultiBody(100, colSphereId, basePosition=[1.0, 1.0, 0.0])
+        client.changeDynamics(colSphereId, -1, lateralFriction=lateral_friction)
+        client.createMultiBody(100, colSphereId1, basePosition=[1.2, 1.0, 0.0])
+        client.changeDynamics(colSphereId1, -1, lateralFriction=lateral_friction)
+        client.createMultiBody(100, colSphereId2, basePosition=[1.4, 1.0, 0.0])
+        client.changeDynamics(colSphereId2, -1, lateralFriction=lateral_friction)
+        client.createMultiBody(100, colSphereId3, basePosition=[1.6, 1.0, 0.0])
+        client.changeDynamics(colSphereId3, -1, lateralFriction=lateral_friction)
+        # client.createMultiBody(10, colSphereId4, basePosition=[2.7, 1.0, 0.0])
+        # client.changeDynamics(colSphereId4, -1, lateralFriction=0.5)
+        client.changeDynamics(ground_id, -1, lateralFriction=lateral_friction)
+    elif terrain == "racetrack":
+        os.chdir(path)
+        if not gui:
+            load_gazebo_world(client, "worlds/racetrack_day.world", visual)
+        else:
+            client.configureDebugVisualizer(client.COV_ENABLE_RENDERING, 0)
+            load_gazebo_world(client, "worlds/racetrack_day.world")
+            client.configureDebugVisualizer(shadowMapResolution = 8192)
+            client.configureDebugVisualizer(shadowMapWorldSize = 25)
+            client.configureDebugVisualizer(client.COV_ENABLE_RENDERING, 1)
+
+
+def load_robot(client, spinning_friction, base_pos=robot_start_pos):
+    boxId = client.loadURDF("mini_cheetah/mini_cheetah.urdf", base_pos,
+                            useFixedBase=False)
+    client.changeDynamics(boxId, 3, spinningFriction=spinning_friction)
+    client.changeDynamics(boxId, 7, spinningFriction=spinning_friction)
+    client.changeDynamics(boxId, 11, spinningFriction=spinning_friction)
+    client.changeDynamics(boxId, 15, spinningFriction=spinning_friction)
+    return boxId
+
+
+def robot_reset_height(terrain):
+    if terrain == "racetrack":
+        return 0.4
+    return robot_height
+
+
+def reset_robot_pose(client, body_id, base_pos):
+    client.resetBasePositionAndOrientation(body_id, base_pos, [0, 0, 0, 1])
+    client.resetBaseVelocity(body_id, [0, 0, 0], [0, 0, 0])
+    for j in range(12):
+        client.resetJointState(body_id, motor_id_list[j], init_new_pos[j], init_new_pos[j+12])
+
+
+def disable_motors(client, body_id):
+    # release the default velocity motors so the joints are torque controlled
+    for j in range(16):
+        client.setJointMotorControl2(body_id, j, client.VELOCITY_CONTROL, force=0)
+
+
+def read_robot_state(client, body_id, last_vel, freq, imu_data, leg_data):
+    # fills the 10 imu values and 24 joint values in place, returns the base
+    # position and the base velocity for the next acceleration estimate
+    base_pos, base_orn = client.getBasePositionAndOrientation(body_id)
+    lin_vel, ang_vel = client.getBaseVelocity(body_id)
+    # v.dot(rot) rotates a world frame vector into the body frame
+    rot = numpy.reshape(client.getMatrixFromQuaternion(base_orn), (3, 3))
+    lin_vel = numpy.asarray(lin_vel)
+
+    # IMU data
+    imu_data[3:7] = base_orn
+    numpy.dot(ang_vel, rot, out=imu_data[7:10])
+
+    # calculate the acceleration of the robot
+    acc = (lin_vel - last_vel) * freq
+    acc[2] += 9.8
+    numpy.dot(acc, rot, out=imu_data[0:3])
+
+    # joint data
+    joint_state = list(zip(*client.getJointStates(body_id, motor_id_list)))
+    leg_data[0:12] = joint_state[0]
+    leg_data[12:24] = joint_state[1]
+
+    return base_pos, lin_vel
@@ -0,0 +1,78 @@
+import numpy
+from numpy.lib.format import open_memmap
+
+from gait_ctrller import N_Motors
+
+
+# one row per control tick, every field is float64 so a row is also a plain
+# slice of doubles. seq counts the writes, the tick goes back on a reset.
+# rows that were never written have seq -1
+TELEMETRY_FIELDS = [("seq", ()),
+                    ("tick", ()),
+                    ("imu_data", (10,)),
+                    ("leg_data", (24,)),
+                    ("base_pos", (3,)),
+                    ("tau", (N_Motors,)),
+                    ("joint_target", (5, N_Motors)),
+                    ("mcp_force", (N_Motors,))]
+
+telemetry_dtype = numpy.dtype([(name, numpy.float64, shape) if shape else (name, numpy.float64)
+                               for name, shape in TELEMETRY_FIELDS])
+
+
+def _columns():
+    columns = {}
+    start = 0
+    for name, shape in TELEMETRY_FIELDS:
+        size = int(numpy.prod(shape))
+        columns[name] = slice(start, start + size)
+        start += size
+    return columns, start
+
+
+class TelemetryRecorder(object):
+    # preallocated ring buffer in a memory mapped .npy file, when it is full
+    # the oldest ticks are overwritten. record() only copies into the map,
+    # the OS writes the pages back
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.data = open_memmap(path, mode="w+", dtype=telemetry_dtype, shape=(capacity,))
+        self.columns, width = _columns()
+        # plain ndarray view, slicing the memmap subclass costs ten times more
+        self.rows = numpy.asarray(self.data).view(numpy.float64).reshape(capacity, width)
+        self.rows[:, 0] = -1
+        self.count = 0
+
+    def record(self, tick, imu_data, leg_data, base_pos, tau, joint_target, mcp_force):
+        if self.rows is None:
+            # closed by a shutdown hook while the loop still runs
+            return
+        row = self.rows[self.count % self.capacity]
+        columns = self.columns
+        row[0] = self.count
+        row[1] = tick
+        row[columns["imu_data"]] = imu_data
+        row[columns["leg_data"]] = leg_data
+        row[columns["base_pos"]] = base_pos
+        row[columns["tau"]] = tau
+        row[columns["joint_target"]] = joint_target.ravel()
+        row[columns["mcp_force"]] = mcp_force
+        self.count += 1
+
+    def close(self):
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+            self.rows = None
+
+
+def load_telemetry(path):
+    # the recorded ticks in the order they were written, also across resets,
+    # fields are read by name, e.g. log["leg_data"][:, 0:12] are the joint
+    # positions of every tick
+    data = numpy.load(path, mmap_mode="r")
+    seq = data["seq"]
+    order = numpy.argsort(seq, kind="stable")
+    order = order[seq[order] >= 0]
+    return data[order]
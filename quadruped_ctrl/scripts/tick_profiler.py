@@ -0,0 +1,127 @@
+import csv
+import time
+import threading
+import numpy
+import rospy
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+
+
+class StageStats(object):
+    # the latest `window` durations of one stage in a ring buffer
+    def __init__(self, window):
+        self.samples = numpy.zeros(window)
+        self.index = 0
+        self.count = 0
+        self.max = 0.0
+        self.total = 0.0
+
+    def record(self, elapsed):
+        self.samples[self.index] = elapsed
+        self.index += 1
+        if self.index == len(self.samples):
+            self.index = 0
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def percentiles(self):
+        # the linear interpolation of numpy.percentile from one partition,
+        # half the time of percentile itself
+        n = min(self.count, len(self.samples))
+        if n == 0:
+            return 0.0, 0.0
+        positions = [0.5 * (n - 1), 0.99 * (n - 1)]
+        lows = [int(pos) for pos in positions]
+        highs = [min(low + 1, n - 1) for low in lows]
+        part = numpy.partition(self.samples[:n], sorted(set(lows + highs)))
+        return tuple(part[low] + (part[high] - part[low]) * (pos - low)
+                     for pos, low, high in zip(positions, lows, highs))
+
+
+class TickProfiler(object):
+    # per-task wall time of the scheduler, a stage is a scheduler task and
+    # "tick" is the whole scheduler step
+    def __init__(self, scheduler, window=5000):
+        self.scheduler = scheduler
+        self.window = window
+        self.stages = {}
+        self.order = []
+        self.stopped = threading.Event()
+        scheduler.profiler = self
+
+    def record(self, name, elapsed):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(self.window)
+            self.order.append(name)
+        stats.record(elapsed)
+
+    def misses(self, name):
+        if name == "tick":
+            return self.scheduler.overruns
+        for task in self.scheduler.tasks:
+            if task.name == name:
+                return task.overruns
+        return 0
+
+    def summary(self, yield_gil=False):
+        # (stage, count, p50, p99, max, mean, deadline misses), times in us.
+        # yield_gil lets a waiting loop thread run after every stage
+        rows = []
+        for name in self.order:
+            if yield_gil:
+                time.sleep(0)
+            stats = self.stages[name]
+            p50, p99 = stats.percentiles()
+            mean = stats.total / stats.count if stats.count else 0.0
+            rows.append((name, stats.count, p50 * 1e6, p99 * 1e6, stats.max * 1e6,
+                         mean * 1e6, self.misses(name)))
+        return rows
+
+    def init_publisher(self, topic="/diagnostics"):
+        self.diag_pub = rospy.Publisher(topic, DiagnosticArray, queue_size=1)
+
+    def start_publisher(self, rate, topic="/diagnostics"):
+        # publishes from its own thread, so the percentiles over the windows
+        # are not computed inside the ticks they measure. the loop keeps
+        # recording meanwhile, a summary can be off by the latest sample
+        self.init_publisher(topic)
+        period = 1.0 / rate
+
+        def run():
+            while not self.stopped.wait(period) and not rospy.is_shutdown():
+                self.publish(yield_gil=True)
+        thread = threading.Thread(target=run, name="diagnostics")
+        thread.daemon = True
+        thread.start()
+
+    def stop_publisher(self):
+        self.stopped.set()
+
+    def publish(self, yield_gil=False):
+        status = DiagnosticStatus()
+        status.level = DiagnosticStatus.OK
+        status.name = "quadruped_simulator: tick timing"
+        status.hardware_id = "walking_simulation"
+        for name, count, p50, p99, max_us, mean, misses in self.summary(yield_gil):
+            status.values.append(KeyValue(name + " p50 [us]", "%.1f" % p50))
+            status.values.append(KeyValue(name + " p99 [us]", "%.1f" % p99))
+            status.values.append(KeyValue(name + " max [us]", "%.1f" % max_us))
+            status.values.append(KeyValue(name + " deadline misses", str(misses)))
+            if misses > 0:
+                status.level = DiagnosticStatus.WARN
+        status.message = "deadline misses" if status.level else "ok"
+        diag = DiagnosticArray()
+        diag.header.stamp = rospy.Time.now()
+        diag.status.append(status)
+        self.diag_pub.publish(diag)
+
+    def dump_csv(self, path):
+        with open(path, "w") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "count", "p50_us", "p99_us", "max_us", "mean_us",
+                             "deadline_misses"])
+            for row in self.summary():
+                writer.writerow(row)
+        rospy.loginfo("tick timing written to " + path)
@@ -0,0 +1,308 @@
+import time
+import signal
+import threading
+from multiprocessing import shared_memory, resource_tracker
+import numpy
+import yaml
+
+
+# every topic and service is a flat float64 array, the fields the ros message
+# carries in this order
+TOPICS = [("cmd_vel", 3),     # linear.x, linear.y, angular.x
+          ("gait_type", 1),   # cmd
+          ("robot_mode", 1),  # cmd
+          ("odom", 7),        # position xyz, orientation xyzw
+          ("imu", 10),        # linear acceleration, orientation xyzw, angular velocity
+          ("clock", 1),       # simulated time [s]
+          ("clock_ack", 1)]   # simulated time a participant is done with [s]
+SERVICES = ("gait_type", "robot_mode")
+
+# a topic in shared memory is a sequence counter, the stamp and the values
+SLOT_HEADER = 2
+
+
+class SlotBusy(Exception):
+    # a slot stayed in the middle of a write, its writer likely died
+    pass
+
+
+class RosTransport(object):
+    # the topics and services of walking_simulation on a ros master, output
+    # messages are created once and filled from the flat values. ros is only
+    # imported here, so a client of the local transport needs just numpy and
+    # yaml. the simulator itself still imports rospy, rospkg and the messages
+    def __init__(self, node_name="quadruped_simulator"):
+        import rospy
+        from geometry_msgs.msg import Twist
+        from nav_msgs.msg import Odometry
+        from sensor_msgs.msg import Imu
+        from rosgraph_msgs.msg import Clock
+        from quadruped_ctrl.srv import QuadrupedCmd, QuadrupedCmdResponse
+        from publisher_pool import PublisherPool
+        self.rospy = rospy
+        self.msg_types = {"cmd_vel": Twist, "odom": Odometry, "imu": Imu, "clock": Clock,
+                          "clock_ack": Clock, "service": QuadrupedCmd,
+                          "response": QuadrupedCmdResponse}
+        rospy.init_node(node_name, anonymous=True)
+        self.pool = PublisherPool()
+        self.fill = {}
+        self.stamped = set()
+        self.services = []
+
+    def get_params(self):
+        return self.rospy.get_param("/simulation", {})
+
+    def subscribe(self, topic, callback):
+        # callback(values) with the flat values of the message
+        if topic == "cmd_vel":
+            def on_msg(msg):
+                callback([msg.linear.x, msg.linear.y, msg.angular.x])
+        elif topic == "clock_ack":
+            def on_msg(msg):
+                callback([msg.clock.to_sec()])
+        else:
+            raise ValueError("cannot subscribe to " + topic)
+        # the lockstep ack is latency bound, no nagle batching for it
+        self.rospy.Subscriber(topic, self.msg_types[topic], on_msg, buff_size=10000,
+                              tcp_nodelay=(topic == "clock_ack"))
+
+    def serve(self, service, callback):
+        # callback(cmd) returns (result, description)
+        response = self.msg_types["response"]
+
+        def on_request(req):
+            result, description = callback(req.cmd)
+            return response(result, description)
+        self.services.append(self.rospy.Service(service, self.msg_types["service"], on_request))
+
+    def advertise(self, topic):
+        if topic == "odom":
+            odom = self.pool.register("odom", "/robot_odom", self.msg_types[topic],
+                                      queue_size=100)
+            odom.header.frame_id = "world"
+            odom.child_frame_id = "world"
+            self.fill[topic] = _fill_odom
+            self.stamped.add(topic)
+        elif topic == "imu":
+            imu_msg = self.pool.register("imu", "/imu0", self.msg_types[topic], queue_size=100)
+            imu_msg.header.frame_id = "robot"
+            self.fill[topic] = _fill_imu
+            self.stamped.add(topic)
+        elif topic == "clock":
+            self.pool.register("clock", "/clock", self.msg_types[topic], queue_size=1)
+            self.fill[topic] = self._fill_clock
+        else:
+            raise ValueError("cannot advertise " + topic)
+
+    def _fill_clock(self, clock, values):
+        clock.clock = self.rospy.Time.from_sec(values[0])
+
+    def publish(self, topic, values, stamp=None):
+        # stamp in seconds, None is now
+        msg = self.pool.message(topic)
+        self.fill[topic](msg, values)
+        if topic in self.stamped:
+            if stamp is None:
+                msg.header.stamp = self.rospy.Time.now()
+            else:
+                msg.header.stamp = self.rospy.Time.from_sec(stamp)
+        self.pool.publish(topic)
+
+    def poll(self):
+        # rospy runs the callbacks in its own threads
+        pass
+
+    def spin(self):
+        self.rospy.spin()
+
+    def is_shutdown(self):
+        return self.rospy.is_shutdown()
+
+    def on_shutdown(self, func):
+        self.rospy.on_shutdown(func)
+
+    def shutdown(self, reason="shutdown"):
+        self.rospy.signal_shutdown(reason)
+
+
+def _fill_odom(odom, values):
+    odom.pose.pose.position.x = values[0]
+    odom.pose.pose.position.y = values[1]
+    odom.pose.pose.position.z = values[2]
+    odom.pose.pose.orientation.x = values[3]
+    odom.pose.pose.orientation.y = values[4]
+    odom.pose.pose.orientation.z = values[5]
+    odom.pose.pose.orientation.w = values[6]
+
+
+def _fill_imu(imu_msg, values):
+    imu_msg.linear_acceleration.x = values[0]
+    imu_msg.linear_acceleration.y = values[1]
+    imu_msg.linear_acceleration.z = values[2]
+    imu_msg.orientation.x = values[3]
+    imu_msg.orientation.y = values[4]
+    imu_msg.orientation.z = values[5]
+    imu_msg.orientation.w = values[6]
+    imu_msg.angular_velocity.x = values[7]
+    imu_msg.angular_velocity.y = values[8]
+    imu_msg.angular_velocity.z = values[9]
+
+
+class LocalTransport(object):
+    # the same topics and services without a ros master or serialization.
+    # subscribers and services are callbacks run in the thread of the sender,
+    # publish() keeps the latest values of every topic for read(). with
+    # shm_name every topic is also a slot in named shared memory: other
+    # processes attach with the same name to read() the outputs and to
+    # publish() or call() inputs, which the owner (create=True) dispatches
+    # from spin(). a call() from another process gets no service response
+    def __init__(self, config_file=None, shm_name=None, create=False, poll_rate=1000.0,
+                 handle_signals=False):
+        self.config_file = config_file
+        self.poll_period = 1.0 / poll_rate
+        self.offsets = {}
+        size = 0
+        for topic, n in TOPICS:
+            self.offsets[topic] = (size, n)
+            size += SLOT_HEADER + n
+        self.callbacks = dict((topic, []) for topic, _ in TOPICS)
+        self.seen = dict((topic, 0.0) for topic, _ in TOPICS)
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.hooks = []
+        self.shm = None
+        self.create = create
+        if shm_name is not None:
+            self.shm = shared_memory.SharedMemory(name=shm_name, create=create,
+                                                  size=size * 8)
+            self.slots = numpy.ndarray((size,), numpy.float64, self.shm.buf)
+            if create:
+                self.slots[:] = 0
+            else:
+                # attaching registers the block too, the tracker would unlink
+                # it when this process exits while the owner still runs
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        else:
+            self.slots = numpy.zeros(size)
+        if handle_signals:
+            signal.signal(signal.SIGINT, lambda *_: self.stopped.set())
+            signal.signal(signal.SIGTERM, lambda *_: self.stopped.set())
+
+    def get_params(self):
+        with open(self.config_file) as f:
+            return yaml.safe_load(f)["simulation"]
+
+    def _slot(self, topic):
+        start, n = self.offsets[topic]
+        return self.slots[start:start + SLOT_HEADER + n]
+
+    def subscribe(self, topic, callback):
+        # callback(values), values is only valid during the call
+        self.callbacks[topic].append(callback)
+
+    def serve(self, service, callback):
+        # callback(cmd) returns (result, description)
+        self.callbacks[service] = [callback]
+
+    def advertise(self, topic):
+        if topic not in self.offsets:
+            raise ValueError("cannot advertise " + topic)
+
+    def publish(self, topic, values, stamp=None):
+        slot = self._slot(topic)
+        # odd while the values are written, as in SharedRobotState
+        slot[0] += 1
+        slot[1] = time.time() if stamp is None else stamp
+        slot[SLOT_HEADER:] = values
+        slot[0] += 1
+        self.seen[topic] = slot[0]
+        for callback in self.callbacks[topic]:
+            callback(slot[SLOT_HEADER:])
+
+    def call(self, service, cmd):
+        callbacks = self.callbacks[service]
+        if callbacks:
+            return callbacks[0](cmd)
+        self.publish(service, [cmd])
+        return 0, "sent"
+
+    def read(self, topic, out, timeout=0.1):
+        # copies the latest values to out, returns (count, stamp), the count
+        # of publishes is 0 until the topic was published. a write takes
+        # microseconds, retries back off from a yield to 1 ms sleeps and
+        # raise SlotBusy after timeout seconds
+        slot = self._slot(topic)
+        deadline = None
+        delay = 0.0
+        while True:
+            seq = slot[0]
+            if seq % 2 == 0:
+                stamp = slot[1]
+                out[:] = slot[SLOT_HEADER:]
+                if slot[0] == seq:
+                    return int(seq) // 2, stamp
+            now = time.time()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise SlotBusy("%s is still being written after %.3f s" % (topic, timeout))
+            time.sleep(delay)
+            delay = min(2 * delay or 1e-5, 1e-3)
+
+    def poll(self):
+        # dispatches what other processes published since the last poll
+        with self.lock:
+            if self.slots is not None:
+                self._dispatch()
+
+    def _dispatch(self):
+        pending = []
+        for topic, callbacks in self.callbacks.items():
+            if not callbacks:
+                continue
+            slot = self._slot(topic)
+            seq = slot[0]
+            if seq == self.seen[topic] or seq % 2 == 1:
+                continue
+            stamp = slot[1]
+            values = numpy.copy(slot[SLOT_HEADER:])
+            if slot[0] != seq:
+                continue
+            self.seen[topic] = seq
+            pending.append((stamp, topic, values))
+        # in the order they were sent, e.g. a gait change before a velocity
+        pending.sort(key=lambda entry: entry[0])
+        for _, topic, values in pending:
+            callbacks = self.callbacks[topic]
+            if topic in SERVICES:
+                callbacks[0](int(values[0]))
+            else:
+                for callback in callbacks:
+                    callback(values)
+
+    def spin(self):
+        if self.shm is None:
+            self.stopped.wait()
+            return
+        while not self.stopped.wait(self.poll_period):
+            self.poll()
+
+    def is_shutdown(self):
+        return self.stopped.is_set()
+
+    def on_shutdown(self, func):
+        self.hooks.append(func)
+
+    def shutdown(self, reason="shutdown"):
+        self.stopped.set()
+        hooks, self.hooks = self.hooks, []
+        for func in hooks:
+            func()
+        with self.lock:
+            if self.shm is not None:
+                # the view has to go before the mapping can be closed
+                self.slots = None
+                self.shm.close()
+                if self.create:
+                    self.shm.unlink()
+                self.shm = None
@@ -0,0 +1,159 @@
+import numpy
+import pybullet
+import pybullet_data
+from pybullet_utils import bullet_client
+
+from gait_ctrller import GaitCtrllerHandle, N_Motors, ZEBRA_SCALE, pd_torque
+from reset_snapshot import SettledSnapshot
+from sim_world import load_terrain, load_robot, motor_id_list, robot_reset_height, \
+    reset_robot_pose, disable_motors, read_robot_state
+
+
+class QuadrupedVecEnv(object):
+    # N mini cheetahs, each with its own controller handle, stepped in
+    # lockstep. with separate_clients every robot gets its own DIRECT physics
+    # client and terrain, otherwise all robots share one world, spaced along y.
+    # imu_data (N, 10) and leg_data (N, 24) are the buffers of the controllers
+    def __init__(self, so_file, num_envs, terrain="plane", path=".", freq=500.0,
+                 mpc_freq=100.0, pid=(100.0, 1.0, 0.0, 0.05), lateral_friction=1.0,
+                 spinning_friction=0.0065, separate_clients=False, spacing=2.0, seed=None,
+                 reset_snapshot=True):
+        self.num_envs = num_envs
+        self.terrain = terrain
+        self.freq = freq
+        self.pid = list(pid)
+        self.mpc_period = max(1, int(round(freq / mpc_freq)))
+        self.mpc_freq = freq / self.mpc_period
+        self.tick = 0
+
+        self.imu_data = numpy.zeros((num_envs, 10))
+        self.leg_data = numpy.zeros((num_envs, 24))
+        self.base_pos = numpy.zeros((num_envs, 3))
+        self.last_vel = numpy.zeros((num_envs, 3))
+        self.joint_target = numpy.zeros((num_envs, 5, N_Motors))
+        self.torque = numpy.zeros((num_envs, N_Motors))
+
+        if separate_clients:
+            self.clients = [self._make_client(terrain, path, lateral_friction, seed)
+                            for _ in range(num_envs)]
+            self.env_clients = self.clients
+            self.origins = numpy.zeros((num_envs, 3))
+        else:
+            client = self._make_client(terrain, path, lateral_friction, seed)
+            self.clients = [client]
+            self.env_clients = [client] * num_envs
+            self.origins = numpy.zeros((num_envs, 3))
+            self.origins[:, 1] = spacing * numpy.arange(num_envs)
+
+        self.body_ids = [load_robot(self.env_clients[i], spinning_friction, self.origins[i])
+                         for i in range(num_envs)]
+        self.ctrls = [GaitCtrllerHandle(so_file, self.mpc_freq, self.pid,
+                                        self.imu_data[i], self.leg_data[i])
+                      for i in range(num_envs)]
+        # the first reset settles the robots, later ones restore that state
+        self.snapshot = SettledSnapshot(self.clients, self.ctrls) if reset_snapshot else None
+        self.reset()
+
+    def _make_client(self, terrain, path, lateral_friction, seed):
+        client = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+        client.setAdditionalSearchPath(pybullet_data.getDataPath())
+        client.resetSimulation()
+        client.setTimeStep(1.0/self.freq)
+        client.setGravity(0, 0, -9.8)
+        # nothing is rendered, so the racetrack is built without its meshes
+        load_terrain(client, terrain, path, lateral_friction, seed, visual=False)
+        return client
+
+    def read_states(self):
+        for i in range(self.num_envs):
+            base_pos, self.last_vel[i] = read_robot_state(
+                self.env_clients[i], self.body_ids[i], self.last_vel[i], self.freq,
+                self.imu_data[i], self.leg_data[i])
+            self.base_pos[i] = base_pos
+
+    def _step_clients(self):
+        for client in self.clients:
+            client.stepSimulation()
+
+    def reset(self):
+        # same sequence as reset_robot() of walking_simulation for all robots
+        if self.snapshot is not None and self.snapshot.captured:
+            saved = self.snapshot.restore()
+            self.last_vel[:] = saved["last_vel"]
+            self.joint_target[:] = saved["joint_target"]
+            self.tick = int(saved["tick"])
+            self.set_robot_mode(0)
+            return
+
+        height = robot_reset_height(self.terrain)
+        self.last_vel[:] = 0
+        for i in range(self.num_envs):
+            reset_robot_pose(self.env_clients[i], self.body_ids[i],
+                             self.origins[i] + [0, 0, height])
+            self.ctrls[i].init_controller(self.mpc_freq, self.pid)
+        for _ in range(10):
+            self._step_clients()
+            self.read_states()
+            for ctrl in self.ctrls:
+                ctrl.pre_work(ctrl.imu_data, ctrl.leg_data)
+        for i in range(self.num_envs):
+            disable_motors(self.env_clients[i], self.body_ids[i])
+
+        self.set_robot_mode(1)
+        self.tick = 0
+        self.step(200)
+        if self.snapshot is not None:
+            self.snapshot.capture(last_vel=self.last_vel, joint_target=self.joint_target,
+                                  tick=self.tick)
+        self.set_robot_mode(0)
+
+    def set_robot_vel(self, vel):
+        # vel is (3,) for every robot or (N, 3)
+        vel = numpy.broadcast_to(vel, (self.num_envs, 3))
+        for i in range(self.num_envs):
+            self.ctrls[i].set_robot_vel(vel[i])
+
+    def set_gait_type(self, gait_type):
+        for ctrl in self.ctrls:
+            ctrl.set_gait_type(gait_type)
+
+    def set_robot_mode(self, mode):
+        for ctrl in self.ctrls:
+            ctrl.set_robot_mode(mode)
+
+    # the stages of one tick, in the order step() runs them
+    def update_mpc(self):
+        for i in range(self.num_envs):
+            ctrl = self.ctrls[i]
+            ctrl.toque_calculator(ctrl.imu_data, ctrl.leg_data)
+            numpy.multiply(ctrl.get_zebra_joint_control(), ZEBRA_SCALE,
+                           out=self.joint_target[i])
+
+    def apply_torque(self):
+        self.torque[:] = pd_torque(self.joint_target, self.leg_data)
+        for i in range(self.num_envs):
+            self.env_clients[i].setJointMotorControlArray(
+                bodyUniqueId=self.body_ids[i], jointIndices=motor_id_list,
+                controlMode=pybullet.TORQUE_CONTROL, forces=self.torque[i])
+
+    def step_physics(self):
+        self._step_clients()
+        self.tick += 1
+
+    def step(self, num_ticks=1):
+        for _ in range(num_ticks):
+            self.read_states()
+            if self.tick % self.mpc_period == 0:
+                self.update_mpc()
+            self.apply_torque()
+            self.step_physics()
+
+    def close(self):
+        if self.snapshot is not None:
+            self.snapshot.clear()
+        for ctrl in self.ctrls:
+            ctrl.destroy()
+        self.ctrls = []
+        for client in self.clients:
+            client.disconnect()
+        self.clients = []
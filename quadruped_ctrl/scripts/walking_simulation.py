@@ -1,91 +1,59 @@
 #!/usr/bin/env python
 
 import os
+import sys
 import numpy
-import pyquaternion
-import pcl
-import tf
 import rospy
 import rospkg
 import time
+import argparse
+import logging
 import threading
 import random
-import ctypes
-from PIL import Image as pil
 import pybullet as p
 import pybullet_data
-from pybullet_utils import gazebo_world_parser
-from sensor_msgs.msg import Imu
-from sensor_msgs.msg import Image
-from nav_msgs.msg import Odometry
-from sensor_msgs.msg import PointCloud2
-from sensor_msgs.msg import PointField
-from geometry_msgs.msg import Twist
-from quadruped_ctrl.srv import QuadrupedCmd, QuadrupedCmdResponse
 
-### add by shimizu
-from zebra_msgs.msg import ZebraJointControl
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from transport import RosTransport, LocalTransport
+from sim_clock import SimClock
+from realtime import RealTimeRate, set_realtime
+from gait_ctrller import GaitCtrller, ZEBRA_SCALE, find_library, pd_torque
+from sim_world import load_terrain, load_robot, motor_id_list, robot_reset_height, \
+    reset_robot_pose, disable_motors, read_robot_state
+from sim_camera import CameraPublisher
+from camera_worker import start_camera_worker
+from scheduler import TickScheduler
+from reset_snapshot import SettledSnapshot
+from telemetry import TelemetryRecorder
+from joint_stream import JointStream
+from command_log import CommandLog, CommandPlayer, CommandQueue, load_commands
+from tick_profiler import TickProfiler
 
 
 get_last_vel = [0] * 3
-robot_height = 0.30
-motor_id_list = [0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14]
-init_new_pos = [0.0, -0.8, 1.6, 0.0, -0.8, 1.6, 0.0, -0.8, 1.6, 0.0, -0.8, 1.6,
-                0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
 ###### add by shimizu
-skip_num =5
 position_control_mode = True
-
-class StructPointer(ctypes.Structure):
-    _fields_ = [("eff", ctypes.c_double * 12)]
-
-class ZebraPointer(ctypes.Structure):
-    _fields_ = [("position", ctypes.c_double * 12),("velocity", ctypes.c_double * 12),
-    ("kp", ctypes.c_double * 12),("kd", ctypes.c_double * 12),
-    ("effort", ctypes.c_double * 12)]
-
-def convert_type(input):
-    ctypes_map = {int: ctypes.c_int,
-                  float: ctypes.c_double,
-                  str: ctypes.c_char_p
-                  }
-    input_type = type(input)
-    if input_type is list:
-        length = len(input)
-        if length == 0:
-            rospy.logerr("convert type failed...input is "+input)
-            return 0
-        else:
-            arr = (ctypes_map[type(input[0])] * length)()
-            for i in range(length):
-                arr[i] = bytes(
-                    input[i], encoding="utf-8") if (type(input[0]) is str) else input[i]
-            return arr
-    else:
-        if input_type in ctypes_map:
-            return ctypes_map[input_type](bytes(input, encoding="utf-8") if type(input) is str else input)
-        else:
-            rospy.logerr("convert type failed...input is "+input)
-            return 0
-
+joint_target = numpy.zeros((5, 12))
 
 def thread_job():
-    rospy.spin()
+    transport.spin()
 
 
-def callback_gait(req):
-    cpp_gait_ctrller.set_gait_type(convert_type(req.cmd))
-    return QuadrupedCmdResponse(0, "get the gait")
+# the callbacks run on the transport threads, they only queue the command and
+# the loop applies it before the next mpc update
+def callback_gait(cmd):
+    commands.set_gait_type(cmd)
+    return 0, "get the gait"
 
 
-def callback_mode(req):
-    cpp_gait_ctrller.set_robot_mode(convert_type(req.cmd))
-    return QuadrupedCmdResponse(0, "get the mode")
+def callback_mode(cmd):
+    commands.set_robot_mode(cmd)
+    return 0, "get the mode"
 
 
-def callback_body_vel(msg):
-    vel = [msg.linear.x, msg.linear.y, msg.angular.x]
-    cpp_gait_ctrller.set_robot_vel(convert_type(vel))
+def callback_body_vel(vel):
+    # linear x, linear y and the yaw rate in angular.x of cmd_vel
+    commands.set_robot_vel(vel)
 
 
 def acc_filter(value, last_accValue):
@@ -94,539 +62,382 @@ def acc_filter(value, last_accValue):
     return filter_value
 
 
-def pub_nav_msg(base_pos, imu_data):
-    pub_odom = rospy.Publisher("/robot_odom", Odometry, queue_size=100)
-    odom = Odometry()
-    odom.header.stamp = rospy.Time.now()
-    odom.header.frame_id ="world"
-    odom.child_frame_id = "world"
-    odom.pose.pose.position.x = base_pos[0]
-    odom.pose.pose.position.y = base_pos[1]
-    odom.pose.pose.position.z = base_pos[2]
-    odom.pose.pose.orientation.x = imu_data[3]
-    odom.pose.pose.orientation.y = imu_data[4]
-    odom.pose.pose.orientation.z = imu_data[5]
-    odom.pose.pose.orientation.w = imu_data[6]
-
-    pub_odom.publish(odom)
-
-
-def pub_imu_msg(imu_data):
-    pub_imu = rospy.Publisher("/imu0", Imu, queue_size=100)
-    imu_msg = Imu()
-    imu_msg.linear_acceleration.x = imu_data[0]
-    imu_msg.linear_acceleration.y = imu_data[1]
-    imu_msg.linear_acceleration.z = imu_data[2]
-    imu_msg.angular_velocity.x = imu_data[7]
-    imu_msg.angular_velocity.y = imu_data[8]
-    imu_msg.angular_velocity.z = imu_data[9]
-    imu_msg.orientation.x = imu_data[3]
-    imu_msg.orientation.y = imu_data[4]
-    imu_msg.orientation.z = imu_data[5]
-    imu_msg.orientation.w = imu_data[6]
-    imu_msg.header.stamp = rospy.Time.now()
-    imu_msg.header.frame_id = "robot"
-    pub_imu.publish(imu_msg)
+def init_publishers():
+    global odom_values
+    transport.advertise("odom")
+    transport.advertise("imu")
+    # position and orientation of the base
+    odom_values = numpy.zeros(7)
 
 
 def get_data_from_sim():
     global get_last_vel
-    get_orientation = []
-    get_matrix = []
-    get_velocity = []
-    get_invert = []
-    imu_data = [0] * 10
-    leg_data = [0] * 24
-
-    pose_orn = p.getBasePositionAndOrientation(boxId)
-
-    for i in range(4):
-        get_orientation.append(pose_orn[1][i])
-    # get_euler = p.getEulerFromQuaternion(get_orientation)
-    get_velocity = p.getBaseVelocity(boxId)
-    get_invert = p.invertTransform(pose_orn[0], pose_orn[1])
-    get_matrix = p.getMatrixFromQuaternion(get_invert[1])
-
-    # IMU data
-    imu_data[3] = pose_orn[1][0]
-    imu_data[4] = pose_orn[1][1]
-    imu_data[5] = pose_orn[1][2]
-    imu_data[6] = pose_orn[1][3]
-
-    imu_data[7] = get_matrix[0] * get_velocity[1][0] + get_matrix[1] * \
-        get_velocity[1][1] + get_matrix[2] * get_velocity[1][2]
-    imu_data[8] = get_matrix[3] * get_velocity[1][0] + get_matrix[4] * \
-        get_velocity[1][1] + get_matrix[5] * get_velocity[1][2]
-    imu_data[9] = get_matrix[6] * get_velocity[1][0] + get_matrix[7] * \
-        get_velocity[1][1] + get_matrix[8] * get_velocity[1][2]
-
-    # calculate the acceleration of the robot
-    linear_X = (get_velocity[0][0] - get_last_vel[0]) * freq
-    linear_Y = (get_velocity[0][1] - get_last_vel[1]) * freq
-    linear_Z = 9.8 + (get_velocity[0][2] - get_last_vel[2]) * freq
-    imu_data[0] = get_matrix[0] * linear_X + \
-        get_matrix[1] * linear_Y + get_matrix[2] * linear_Z
-    imu_data[1] = get_matrix[3] * linear_X + \
-        get_matrix[4] * linear_Y + get_matrix[5] * linear_Z
-    imu_data[2] = get_matrix[6] * linear_X + \
-        get_matrix[7] * linear_Y + get_matrix[8] * linear_Z
-
-    # joint data
-    joint_state = p.getJointStates(boxId, motor_id_list)
-    leg_data[0:12] = [joint_state[0][0], joint_state[1][0], joint_state[2][0],
-                      joint_state[3][0], joint_state[4][0], joint_state[5][0],
-                      joint_state[6][0], joint_state[7][0], joint_state[8][0],
-                      joint_state[9][0], joint_state[10][0], joint_state[11][0]]
-
-    leg_data[12:24] = [joint_state[0][1], joint_state[1][1], joint_state[2][1],
-                       joint_state[3][1], joint_state[4][1], joint_state[5][1],
-                       joint_state[6][1], joint_state[7][1], joint_state[8][1],
-                       joint_state[9][1], joint_state[10][1], joint_state[11][1]]
-    com_velocity = [get_velocity[0][0],
-                    get_velocity[0][1], get_velocity[0][2]]
-    # get_last_vel.clear()
-    get_last_vel = []
-    get_last_vel = com_velocity
-
-    return imu_data, leg_data, pose_orn[0]
+    # fill the controller's own buffers, no copy is needed to hand them over
+    imu_data = cpp_gait_ctrller.imu_data
+    leg_data = cpp_gait_ctrller.leg_data
+    base_pos, get_last_vel = read_robot_state(p, boxId, get_last_vel, freq, imu_data, leg_data)
+    return imu_data, leg_data, base_pos
 
 
 def reset_robot():
-    if terrain == "racetrack":
-        robot_z = 0.4
-    else:
-        robot_z = robot_height
-    p.resetBasePositionAndOrientation(
-        boxId, [0, 0, robot_z], [0, 0, 0, 1])
-    p.resetBaseVelocity(boxId, [0, 0, 0], [0, 0, 0])
-    for j in range(12):
-        p.resetJointState(boxId, motor_id_list[j], init_new_pos[j], init_new_pos[j+12])
-    cpp_gait_ctrller.init_controller(convert_type(
-        freq/skip_num), convert_type([stand_kp, stand_kd, joint_kp, joint_kd]))
+    global get_last_vel
+    if snapshot is not None and snapshot.captured:
+        saved = snapshot.restore()
+        joint_target[:] = saved["joint_target"]
+        get_last_vel = saved["last_vel"]
+        scheduler.tick = int(saved["tick"])
+        cpp_gait_ctrller.set_robot_mode(0)
+        return
+
+    reset_robot_pose(p, boxId, [0, 0, robot_reset_height(terrain)])
+    cpp_gait_ctrller.init_controller(
+        mpc_freq, [stand_kp, stand_kd, joint_kp, joint_kd])
 
     for _ in range(10):
-        p.stepSimulation()
+        step_sim()
         imu_data, leg_data, _ = get_data_from_sim()
-        cpp_gait_ctrller.pre_work(convert_type(
-            imu_data), convert_type(leg_data))
-
-    for j in range(16):
-        force = 0
-        p.setJointMotorControl2(
-            boxId, j, p.VELOCITY_CONTROL, force=force)
-    
-    cpp_gait_ctrller.set_robot_mode(convert_type(1))
+        cpp_gait_ctrller.pre_work(imu_data, leg_data)
+
+    disable_motors(p, boxId)
+
+    cpp_gait_ctrller.set_robot_mode(1)
+    scheduler.reset()
     for _ in range(200):
-        run()
-        # p.stepSimulation()
-    cpp_gait_ctrller.set_robot_mode(convert_type(0))
+        scheduler.step(control_only=True)
+    if snapshot is not None:
+        snapshot.capture(joint_target=joint_target, last_vel=get_last_vel,
+                         tick=scheduler.tick)
+    cpp_gait_ctrller.set_robot_mode(0)
 
 
 def init_simulator():
-    global boxId, reset, low_energy_mode, high_performance_mode, terrain, p
-    robot_start_pos = [0, 0, 0.42]
-    p.connect(p.GUI)  # or p.DIRECT for non-graphical version
+    global boxId, reset, low_energy_mode, high_performance_mode, terrain, p, snapshot
+    if headless:
+        p.connect(p.DIRECT)
+    else:
+        p.connect(p.GUI)
     p.setAdditionalSearchPath(pybullet_data.getDataPath())  # optionally
     p.resetSimulation()
     p.setTimeStep(1.0/freq)
     p.setGravity(0, 0, -9.8)
-    reset = p.addUserDebugParameter("reset", 1, 0, 0)
-    low_energy_mode = p.addUserDebugParameter("low_energy_mode", 1, 0, 0)
-    high_performance_mode = p.addUserDebugParameter("high_performance_mode", 1, 0, 0)
-    p.resetDebugVisualizerCamera(0.2, 45, -30, [1, -1, 1])
-
-    heightPerturbationRange = 0.06
-    numHeightfieldRows = 256
-    numHeightfieldColumns = 256
-    if terrain == "plane":
-        planeShape = p.createCollisionShape(shapeType=p.GEOM_PLANE)
-        ground_id = p.createMultiBody(0, planeShape)
-        p.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0, 0, 1])
-        p.changeDynamics(ground_id, -1, lateralFriction=lateralFriction)
-    elif terrain == "random1":
-        heightfieldData = [0]*numHeightfieldRows*numHeightfieldColumns
-        for j in range(int(numHeightfieldColumns/2)):
-            for i in range(int(numHeightfieldRows/2)):
-                height = random.uniform(0, heightPerturbationRange)
-                heightfieldData[2*i+2*j*numHeightfieldRows] = height
-                heightfieldData[2*i+1+2*j*numHeightfieldRows] = height
-                heightfieldData[2*i+(2*j+1)*numHeightfieldRows] = height
-                heightfieldData[2*i+1+(2*j+1)*numHeightfieldRows] = height
-        terrainShape = p.createCollisionShape(shapeType=p.GEOM_HEIGHTFIELD, meshScale=[.05, .05, 1], heightfieldTextureScaling=(
-            numHeightfieldRows-1)/2, heightfieldData=heightfieldData, numHeightfieldRows=numHeightfieldRows, numHeightfieldColumns=numHeightfieldColumns)
-        ground_id = p.createMultiBody(0, terrainShape)
-        p.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0, 0, 1])
-        p.changeDynamics(ground_id, -1, lateralFriction=lateralFriction)
-    elif terrain == "random2":
-        terrain_shape = p.createCollisionShape(
-            shapeType=p.GEOM_HEIGHTFIELD,
-            meshScale=[.5, .5, .5],
-            fileName="heightmaps/ground0.txt",
-            heightfieldTextureScaling=128)
-        ground_id = p.createMultiBody(0, terrain_shape)
-        textureId = p.loadTexture(path+"/models/grass.png")
-        p.changeVisualShape(ground_id, -1, textureUniqueId=textureId)
-        p.resetBasePositionAndOrientation(ground_id, [1, 0, 0.2], [0, 0, 0, 1])
-        p.changeDynamics(ground_id, -1, lateralFriction=lateralFriction)
-    elif terrain == "stairs":
-        planeShape = p.createCollisionShape(shapeType=p.GEOM_PLANE)
-        ground_id = p.createMultiBody(0, planeShape)
-        # p.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0.0872, 0, 0.9962])
-        p.resetBasePositionAndOrientation(ground_id, [0, 0, 0], [0, 0, 0, 1])
-        # many box
-        colSphereId = p.createCollisionShape(
-            p.GEOM_BOX, halfExtents=[0.1, 0.4, 0.01])
-        colSphereId1 = p.createCollisionShape(
-            p.GEOM_BOX, halfExtents=[0.1, 0.4, 0.02])
-        colSphereId2 = p.createCollisionShape(
-            p.GEOM_BOX, halfExtents=[0.1, 0.4, 0.03])
-        colSphereId3 = p.createCollisionShape(
-            p.GEOM_BOX, halfExtents=[0.1, 0.4, 0.04])
-        # colSphereId4 = p.createCollisionShape(
-        #     p.GEOM_BOX, halfExtents=[0.03, 0.03, 0.03])
-        p.createMultiBody(100, colSphereId, basePosition=[1.0, 1.0, 0.0])
-        p.changeDynamics(colSphereId, -1, lateralFriction=lateralFriction)
-        p.createMultiBody(100, colSphereId1, basePosition=[1.2, 1.0, 0.0])
-        p.changeDynamics(colSphereId1, -1, lateralFriction=lateralFriction)
-        p.createMultiBody(100, colSphereId2, basePosition=[1.4, 1.0, 0.0])
-        p.changeDynamics(colSphereId2, -1, lateralFriction=lateralFriction)
-        p.createMultiBody(100, colSphereId3, basePosition=[1.6, 1.0, 0.0])
-        p.changeDynamics(colSphereId3, -1, lateralFriction=lateralFriction)
-        # p.createMultiBody(10, colSphereId4, basePosition=[2.7, 1.0, 0.0])
-        # p.changeDynamics(colSphereId4, -1, lateralFriction=0.5)
-        p.changeDynamics(ground_id, -1, lateralFriction=lateralFriction)
-    elif terrain == "racetrack":
-        os.chdir(path)
-        p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 0)
-        gazebo_world_parser.parseWorld(p, filepath = "worlds/racetrack_day.world")
-        p.configureDebugVisualizer(shadowMapResolution = 8192)
-        p.configureDebugVisualizer(shadowMapWorldSize = 25)
-        p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 1)
-
-    boxId = p.loadURDF("mini_cheetah/mini_cheetah.urdf", robot_start_pos,
-                       useFixedBase=False)
-    p.changeDynamics(boxId, 3, spinningFriction=spinningFriction)
-    p.changeDynamics(boxId, 7, spinningFriction=spinningFriction)
-    p.changeDynamics(boxId, 11, spinningFriction=spinningFriction)
-    p.changeDynamics(boxId, 15, spinningFriction=spinningFriction)
-    jointIds = []
-    for j in range(p.getNumJoints(boxId)):
-        p.getJointInfo(boxId, j)
-        jointIds.append(j)
-
+    if not headless:
+        reset = p.addUserDebugParameter("reset", 1, 0, 0)
+        low_energy_mode = p.addUserDebugParameter("low_energy_mode", 1, 0, 0)
+        high_performance_mode = p.addUserDebugParameter("high_performance_mode", 1, 0, 0)
+        p.resetDebugVisualizerCamera(0.2, 45, -30, [1, -1, 1])
+
+    # the racetrack meshes are only needed when this client renders
+    visual = not headless or (camera and not camera_process)
+    load_terrain(p, terrain, path, lateralFriction, terrain_seed, not headless, visual=visual)
+    boxId = load_robot(p, spinningFriction)
+
+    # the first reset settles the robot, later ones restore the settled state
+    if reset_snapshot:
+        snapshot = SettledSnapshot([p], [cpp_gait_ctrller])
     reset_robot()
 
 
-skip_count=0
-old_tau=0
 tau =[]
 imu_data=0
 leg_data=0
 base_pos=0
-def run():
-    global skip_count, tau, imu_data, leg_data, base_pos
-    # get data from simulator
-    # if skip_count%skip_num== 0:
-        # print("in", skip_count)
-        
+mcp_force=0
+camera_state=None
+snapshot=None
+recorder=None
+joint_stream=None
+sim_clock=None
+scheduler=None
+commands=CommandQueue()
+command_log=None
+command_player=None
+reset_requested=False
+profiler=None
+
+
+def replay_commands():
+    command_player.apply(scheduler.tick, commands)
+
+
+def apply_commands():
+    commands.drain(cpp_gait_ctrller, scheduler.tick, command_log)
+
+
+def read_sim():
+    global imu_data, leg_data, base_pos
     imu_data, leg_data, base_pos = get_data_from_sim()
 
-    #pub msg
-    pub_nav_msg(base_pos, imu_data)
-    pub_imu_msg(imu_data)
 
+def mirror_camera_state():
+    camera_state.write(base_pos, imu_data[3:7], leg_data[0:12])
+
+
+def stamp():
+    # the simulated time in lockstep mode, None stamps with the current time
+    return sim_clock.now() if sim_clock is not None else None
+
+
+def pub_odom():
+    odom_values[0:3] = base_pos
+    odom_values[3:7] = imu_data[3:7]
+    transport.publish("odom", odom_values, stamp())
+
+
+def pub_imu():
+    transport.publish("imu", imu_data, stamp())
+
+
+def update_mpc():
+    global tau
     # call cpp function to calculate mpc tau
-    ### add by shimizu
-    # tau_val = [tau.contents.eff[i] for i in range(N_Motors)]
-
-    
-    # global old_tau
-    # if skip_count%skip_num!=0:
-    #     tau_val=old_tau
-    # old_tau = tau_val
-    
-    # KP = 20
-    if skip_count%skip_num== 0:
-        # stamp_nsec = rospy.Time.now().to_nsec()
-        tau = cpp_gait_ctrller.toque_calculator(convert_type(
-        imu_data), convert_type(leg_data))
-        joint_pointer = cpp_gait_ctrller.get_zebra_joint_control()
-        for i in range(N_Motors):
-            joint_control.position[i] = joint_pointer.contents.position[i]
-            joint_control.velocity[i] = joint_pointer.contents.velocity[i]
-            joint_control.kp[i] = joint_pointer.contents.kp[i]/100
-            joint_control.kd[i] = joint_pointer.contents.kd[i]/5
-            joint_control.effort[i] = joint_pointer.contents.effort[i]
-        # print("t[ms]: ", (rospy.Time.now().to_nsec() - stamp_nsec) / 1000000)
-    skip_count+=1
-    # pub_zebra_ctrl.publish(joint_control)
-    # print("rad")
-    # print(joint_control.kp)
-    # print(joint_control.position)
-    # print(leg_data[:12])
-    mcp_force = [joint_control.kp[i] *  (joint_control.position[i]- leg_data[i])
-     + joint_control.kd[i] *  (joint_control.velocity[i]- leg_data[i+N_Motors])
-     +joint_control.effort[i] for i in range(N_Motors)]
-    # print(joint_control.velocity)
-    # print(leg_data[12:])
-    # print(mcp_force[0], tau.contents.eff[0])
-    # print("target")
-
-    # print(mcp_force)
-    # print(tau.contents.eff[:12])
-    # p.setJointMotorControlArray(bodyIndex=boxId,
-    #                             jointIndices=motor_id_list,
-    #                             controlMode=p.POSITION_CONTROL,
-    #                             targetPositions=joint_control.position)
-    
-    ##########################
+    tau = cpp_gait_ctrller.toque_calculator(imu_data, leg_data)
 
 
+### add by shimizu
+def update_joint_control():
+    # latch the (5, 12) position/velocity/kp/kd/effort targets with the
+    # kp/kd scaling of the simulated motors
+    numpy.multiply(cpp_gait_ctrller.get_zebra_joint_control(), ZEBRA_SCALE, out=joint_target)
+
+
+def apply_torque():
+    global mcp_force
     # set tau to simulator
     if position_control_mode:
-        p.setJointMotorControlArray(bodyUniqueId=boxId,
+        mcp_force = pd_torque(joint_target, leg_data)
+    else:
+        mcp_force = tau
+    p.setJointMotorControlArray(bodyUniqueId=boxId,
                                 jointIndices=motor_id_list,
                                 controlMode=p.TORQUE_CONTROL,
                                 forces=mcp_force)
-    else:
-        p.setJointMotorControlArray(bodyUniqueId=boxId,
-                                    jointIndices=motor_id_list,
-                                    controlMode=p.TORQUE_CONTROL,
-                                    forces=tau.contents.eff)
 
-    # reset visual cam
-    # p.resetDebugVisualizerCamera(2.5, 45, -30, base_pos)
 
+def stream_joints():
+    # the unscaled targets, as the hardware gets them
+    joint_stream.sample(cpp_gait_ctrller.zebra, leg_data, mcp_force)
+
+
+def record_telemetry():
+    recorder.record(scheduler.tick, imu_data, leg_data, base_pos, tau, joint_target, mcp_force)
+
+
+def step_sim():
     p.stepSimulation()
+    if sim_clock is not None:
+        sim_clock.step()
+
+
+def poll_ui():
+    global reset_flag, low_energy_flag, high_performance_flag, reset_requested
+    # check reset button state
+    if(reset_flag < p.readUserDebugParameter(reset)):
+        reset_flag = p.readUserDebugParameter(reset)
+        reset_requested = True
+    if(low_energy_flag < p.readUserDebugParameter(low_energy_mode)):
+        low_energy_flag = p.readUserDebugParameter(low_energy_mode)
+        rospy.logwarn("set robot to low energy mode")
+        cpp_gait_ctrller.set_robot_mode(1)
+    if(high_performance_flag < p.readUserDebugParameter(high_performance_mode)):
+        high_performance_flag = p.readUserDebugParameter(high_performance_mode)
+        rospy.logwarn("set robot to high performance mode")
+        cpp_gait_ctrller.set_robot_mode(0)
+
+
+def init_scheduler():
+    global scheduler, mpc_freq, profiler
+    scheduler = TickScheduler(freq, real_time_factor)
+    if command_player is not None:
+        # first, so a replayed command is seen by this tick's mpc
+        scheduler.add("replay", replay_commands)
+    # the order of registration is the order inside one tick
+    scheduler.add("sim_read", read_sim, control=True)
+    if camera_state is not None:
+        scheduler.add("camera_state", mirror_camera_state, rates.get("camera"),
+                      phases.get("camera", 0), control=True)
+    scheduler.add("odom", pub_odom, rates.get("odom"), phases.get("odom", 0), control=True)
+    scheduler.add("imu", pub_imu, rates.get("imu"), phases.get("imu", 0), control=True)
+    if sim_clock is not None:
+        # after the sensors, so a participant acks a time it has the data of
+        scheduler.add("clock", sim_clock.publish, rates.get("clock"), phases.get("clock", 0),
+                      control=True)
+    # queued commands take effect right before the mpc update
+    scheduler.add("commands", apply_commands, rates.get("mpc", 100.0), phases.get("mpc", 0),
+                  control=True)
+    scheduler.add("mpc", update_mpc, rates.get("mpc", 100.0), phases.get("mpc", 0), control=True)
+    scheduler.add("joint_control", update_joint_control, rates.get("mpc", 100.0),
+                  phases.get("mpc", 0), control=True)
+    scheduler.add("pd", apply_torque, control=True)
+    scheduler.add("step", step_sim, control=True)
+    mpc_freq = scheduler.rate_of("mpc")
+    if profile:
+        profiler = TickProfiler(scheduler)
+
+
+def init_ui_tasks():
+    global reset_flag, low_energy_flag, high_performance_flag, recorder, joint_stream
+    if camera and not camera_process:
+        camera_pub = CameraPublisher(p, boxId, camera_width, camera_height, camera_encoding,
+                                     clock=sim_clock.now if sim_clock is not None else None)
+        # the frames and the image share one pose and one stamp
+        scheduler.add("camera", camera_pub.update, rates.get("camera", 20.0), phases.get("camera", 0))
+    if not headless:
+        reset_flag = p.readUserDebugParameter(reset)
+        low_energy_flag = p.readUserDebugParameter(low_energy_mode)
+        high_performance_flag = p.readUserDebugParameter(high_performance_mode)
+        scheduler.add("ui", poll_ui, rates.get("ui", 20.0), phases.get("ui", 0))
+    if telemetry:
+        # the settle is not recorded, the log starts with the first walking tick
+        recorder = TelemetryRecorder(os.path.expanduser(telemetry),
+                                     int(telemetry_seconds * freq))
+        scheduler.add("telemetry", record_telemetry)
+        transport.on_shutdown(recorder.close)
+    if joint_stream_enabled and use_ros:
+        joint_stream = JointStream(joint_ticks_per_msg)
+        scheduler.add("joints", stream_joints, rates.get("joints"), phases.get("joints", 0))
+    if profile:
+        if use_ros:
+            # outside the loop, the summary is not part of the measured ticks
+            profiler.start_publisher(rates.get("diagnostics", 1.0))
+            transport.on_shutdown(profiler.stop_publisher)
+        if profile_csv:
+            transport.on_shutdown(lambda: profiler.dump_csv(profile_csv))
+
 
-    
-    return
-
-
-def camera_update():
-    rate_1 = rospy.Rate(20)
-    near = 0.1
-    far = 1000
-    step_index = 4
-    pixelWidth = int(320/step_index)
-    pixelHeight = int(240/step_index)
-    cameraEyePosition = [0.3, 0, 0.26436384367425125]
-    cameraTargetPosition = [1.0, 0, 0]
-    cameraUpVector = [45, 45, 0]
-    pub_pointcloud = PointCloud2()
-    pub_image = Image()
-    pointcloud_publisher = rospy.Publisher("/generated_pc", PointCloud2, queue_size=10)
-    image_publisher = rospy.Publisher("/cam0/image_raw", Image, queue_size=10)
-
-    robot_tf = tf.TransformBroadcaster()
-
-    while not rospy.is_shutdown():
-        cubePos, cubeOrn = p.getBasePositionAndOrientation(boxId)
-        get_matrix = p.getMatrixFromQuaternion(cubeOrn)
-        # T1 = numpy.mat([[0, -numpy.sqrt(2.0)/2.0, numpy.sqrt(2.0)/2.0, 0.25], [-1, 0, 0, 0],
-        #                 [0, -numpy.sqrt(2.0)/2.0, -numpy.sqrt(2.0)/2.0, 0], [0, 0, 0, 1]])
-        T1 = numpy.mat([[0, -1.0/2.0, numpy.sqrt(3.0)/2.0, 0.25], [-1, 0, 0, 0],
-                        [0, -numpy.sqrt(3.0)/2.0, -1.0/2.0, 0], [0, 0, 0, 1]])
-
-        T2 = numpy.mat([[get_matrix[0], get_matrix[1], get_matrix[2], cubePos[0]], 
-                        [get_matrix[3], get_matrix[4], get_matrix[5], cubePos[1]], 
-                        [get_matrix[6], get_matrix[7], get_matrix[8], cubePos[2]], 
-                        [0, 0, 0, 1]])
-        
-        T2_ = (T2.I)
-        T3_ = numpy.array(T2*T1)
-
-        cameraEyePosition[0] = T3_[0][3]
-        cameraEyePosition[1] = T3_[1][3]
-        cameraEyePosition[2] = T3_[2][3]
-        cameraTargetPosition = (numpy.mat(T3_)*numpy.array([[0],[0],[1],[1]]))[0:3]
-
-        q = pyquaternion.Quaternion(matrix=T3_)
-        cameraQuat = [q[1], q[2], q[3], q[0]]
-
-        robot_tf.sendTransform(cubePos, cubeOrn, rospy.Time.now(), "robot", "world")
-        robot_tf.sendTransform(cameraEyePosition, cameraQuat, rospy.Time.now(), "cam", "world")
-        robot_tf.sendTransform(cameraTargetPosition, cubeOrn, rospy.Time.now(), "tar", "world")
-
-        cameraUpVector = [0, 0, 1]
-        viewMatrix = p.computeViewMatrix(
-            cameraEyePosition, cameraTargetPosition, cameraUpVector)
-        aspect = float(pixelWidth) / float(pixelHeight)
-        projectionMatrix = p.computeProjectionMatrixFOV(60, aspect, near, far)
-        width, height, rgbImg, depthImg, _ = p.getCameraImage(pixelWidth,
-                                   pixelHeight,
-                                   viewMatrix=viewMatrix,
-                                   projectionMatrix=projectionMatrix,
-                                   shadow=1,
-                                   lightDirection=[1, 1, 1],
-                                   renderer=p.ER_BULLET_HARDWARE_OPENGL)
-
-        # point cloud mehted 1
-        # imgW = width
-        # imgH = height
-        # depth_img_buffer = numpy.reshape(depthImg, [imgH, imgW])
-        # projectionMatrix1 = numpy.asarray(projectionMatrix).reshape([4,4],order='F')
-        # viewMatrix1 = numpy.asarray(viewMatrix).reshape([4,4],order='F')
-        # tran_pix_world = numpy.linalg.inv(numpy.matmul(projectionMatrix1, viewMatrix1))
-        # pcl_data = pcl.PointCloud()
-        # pc_list = [0]*(imgW*imgH)
-        # pc = numpy.zeros(3)
-        # pixPos = numpy.ones(4)
-        # pixPosZ = (2.0*depth_img_buffer - 1.0)
-        # for h in range(0, imgH):
-        #     for w in range(0, imgW):
-        #         pixPos[0] = (2.0*w - imgW)/imgW
-        #         pixPos[1] = -(2.0*h - imgH)/imgH
-        #         pixPos[2] = pixPosZ[h,w]
-        #         position = tran_pix_world.dot(pixPos)
-        #         for ii in range(3):
-        #             pc[ii] = position[ii] / position[3]
-        #         pc_list[h*imgW+w]=pc.tolist()
-
-        # point cloud mehted 2
-        pc_list = []
-        pcl_data = pcl.PointCloud()
-        fx = (pixelWidth*projectionMatrix[0])/2.0
-        fy = (pixelHeight*projectionMatrix[5])/2.0
-        cx = (1-projectionMatrix[2])*pixelWidth/2.0
-        cy = (1+projectionMatrix[6])*pixelHeight/2.0
-        cloud_point = [0]*pixelWidth*pixelHeight*3
-        depthBuffer = numpy.reshape(depthImg,[pixelHeight,pixelWidth])
-        depth = depthBuffer
-        for h in range(0, pixelHeight):    
-            for w in range(0, pixelWidth):   
-                depth[h][w] =float(depthBuffer[h,w])
-                depth[h][w] = far * near / (far - (far - near) * depthBuffer[h][w])
-                Z= float(depth[h][w])
-                if (Z >4):
-                    continue
-                if (Z< 0.01):
-                    continue 
-                X=(w-cx)*Z/fx
-                Y=(h-cy)*Z/fy
-                XYZ_= numpy.mat([[X],[Y],[Z],[1]])
-                XYZ =numpy.array(T3_*XYZ_)
-                # XYZ = numpy.array(XYZ_)
-                X= float(XYZ[0])
-                Y= float(XYZ[1])
-                Z= float(XYZ[2])
-                cloud_point[h*pixelWidth*3+w*3+0] = float(X)
-                cloud_point[h*pixelWidth*3+w*3+1] = float(Y)
-                cloud_point[h*pixelWidth*3+w*3+2] = float(Z)
-                pc_list.append([X,Y,Z])
-
-        pcl_data.from_list(pc_list)
-        pub_pointcloud.header.stamp = rospy.Time().now()
-        pub_pointcloud.header.frame_id = "world"
-        pub_pointcloud.height = 1
-        pub_pointcloud.width = len(pc_list)
-        pub_pointcloud.point_step = 12
-        pub_pointcloud.fields = [
-            PointField('x', 0, PointField.FLOAT32, 1),
-            PointField('y', 4, PointField.FLOAT32, 1),
-            PointField('z', 8, PointField.FLOAT32, 1)]
-        pub_pointcloud.data = numpy.asarray(pc_list, numpy.float32).tostring()
-        pointcloud_publisher.publish(pub_pointcloud)
-
-        # grey image
-        pub_image.header.stamp = rospy.Time().now()
-        pub_image.header.frame_id = "cam"
-        pub_image.width = width
-        pub_image.height = height
-        pub_image.encoding = "mono8"
-        pub_image.step = width
-        grey = pil.fromarray(rgbImg)
-        pub_image.data = numpy.asarray(grey.convert('L')).reshape([1,-1]).tolist()[0]
-        image_publisher.publish(pub_image)
-
-        
-        rate_1.sleep()
+def run():
+    scheduler.step()
 
 
 def main():
-    cnt = 0
-    rate = rospy.Rate(freq)  # hz
-    reset_flag = p.readUserDebugParameter(reset)
-    low_energy_flag = p.readUserDebugParameter(low_energy_mode)
-    high_performance_flag = p.readUserDebugParameter(high_performance_mode)
-    while not rospy.is_shutdown():
-        # check reset button state
-        if(reset_flag < p.readUserDebugParameter(reset)):
-            reset_flag = p.readUserDebugParameter(reset)
-            rospy.logwarn("reset the robot")
-            cnt = 0
-            reset_robot()
-        if(low_energy_flag < p.readUserDebugParameter(low_energy_mode)):
-            low_energy_flag = p.readUserDebugParameter(low_energy_mode)
-            rospy.logwarn("set robot to low energy mode")
-            cpp_gait_ctrller.set_robot_mode(convert_type(1))
-        if(high_performance_flag < p.readUserDebugParameter(high_performance_mode)):
-            high_performance_flag = p.readUserDebugParameter(high_performance_mode)
-            rospy.logwarn("set robot to high performance mode")
-            cpp_gait_ctrller.set_robot_mode(convert_type(0))
-        
-       
+    global reset_requested
+    # only this thread, the loop, is pinned and raised in priority
+    applied = set_realtime(realtime.get("cpu", -1), realtime.get("fifo_priority", 0))
+    if applied:
+        rospy.loginfo("simulation loop on " + ", ".join(applied))
+    # real_time_factor <= 0 free-runs the simulation as fast as possible
+    if real_time_factor > 0:
+        rate = RealTimeRate(freq * real_time_factor, realtime.get("spin_us", 200.0) * 1e-6,
+                            realtime.get("catch_up", "skip"), realtime.get("max_burst", 10))
+    else:
+        rate = None
+    while not transport.is_shutdown():
         run()
 
-        cnt += 1
-        if cnt > 99999999:
-            cnt = 99999999
-        rate.sleep()
+        if command_player is not None and command_player.reset_due(scheduler.tick):
+            reset_requested = True
+        if reset_requested:
+            reset_requested = False
+            rospy.logwarn("reset the robot")
+            if command_log is not None:
+                # the ticks of the commands after it start over
+                command_log.record(scheduler.tick, "reset", [])
+            reset_robot()
+        if rate is not None:
+            late = rate.sleep()
+            if profiler is not None:
+                profiler.record("start_late", late)
+    if rate is not None:
+        rospy.loginfo(rate.report())
+    # runs the shutdown hooks of the local transport, ros has run them already
+    transport.shutdown()
 
 
 if __name__ == '__main__':
-    rospy.init_node('quadruped_simulator', anonymous=True)
-
-    terrain = rospy.get_param('/simulation/terrain')
-    camera = rospy.get_param('/simulation/camera')
-    lateralFriction = rospy.get_param('/simulation/lateralFriction')
-    spinningFriction = rospy.get_param('/simulation/spinningFriction')
-    freq = rospy.get_param('/simulation/freq')
-    stand_kp = rospy.get_param('/simulation/stand_kp')
-    stand_kd = rospy.get_param('/simulation/stand_kd')
-    joint_kp = rospy.get_param('/simulation/joint_kp')
-    joint_kd = rospy.get_param('/simulation/joint_kd')
-    rospy.loginfo("lateralFriction = " + str(lateralFriction) + " spinningFriction = " + str(spinningFriction))
-    rospy.loginfo(" freq = " + str(freq) + " PID = " + str([stand_kp, stand_kd, joint_kp, joint_kd]))
+    # roslaunch appends its own __name:= arguments, they are ignored here
+    parser = argparse.ArgumentParser(description="quadruped simulator")
+    parser.add_argument("--transport", choices=["ros", "local"], default="ros",
+                        help="local runs without a ros master, see transport.py")
+    parser.add_argument("--config", help="yaml of the local transport, default "
+                        "config/quadruped_ctrl_config.yaml of the package")
+    parser.add_argument("--shm", help="shared memory name of the local transport")
+    args, _ = parser.parse_known_args()
 
     rospack = rospkg.RosPack()
     path = rospack.get_path('quadruped_ctrl')
-    so_file = path.replace('src/quadruped_ctrl',
-                           'devel/lib/libquadruped_ctrl.so')
-    if(not os.path.exists(so_file)):
-        so_file = path.replace('src/quadruped_ctrl',
-                               'build/lib/libquadruped_ctrl.so')
+    use_ros = args.transport == "ros"
+    if use_ros:
+        transport = RosTransport('quadruped_simulator')
+    else:
+        # rospy logging and Time.now() fall back to the wall clock without init_node
+        rospy.rostime.set_rostime_initialized(True)
+        logging.basicConfig(level=logging.INFO)
+        transport = LocalTransport(
+            args.config or os.path.join(path, "config", "quadruped_ctrl_config.yaml"),
+            shm_name=args.shm, create=True, handle_signals=True)
+    params = transport.get_params()
+
+    terrain = params['terrain']
+    camera = params['camera']
+    camera_width = params.get('camera_width', 80)
+    camera_height = params.get('camera_height', 60)
+    camera_encoding = params.get('camera_encoding', "mono8")
+    camera_process = params.get('camera_process', False)
+    lateralFriction = params['lateralFriction']
+    spinningFriction = params['spinningFriction']
+    freq = params['freq']
+    stand_kp = params['stand_kp']
+    stand_kd = params['stand_kd']
+    joint_kp = params['joint_kp']
+    joint_kd = params['joint_kd']
+    headless = params.get('headless', False)
+    real_time_factor = params.get('real_time_factor', 1.0)
+    rates = params.get('rates', {})
+    phases = params.get('phases', {})
+    realtime = params.get('realtime', {})
+    profile = params.get('profile', True)
+    profile_csv = params.get('profile_csv', "")
+    terrain_seed = params.get('terrain_seed', None)
+    reset_snapshot = params.get('reset_snapshot', True)
+    telemetry = params.get('telemetry', "")
+    telemetry_seconds = params.get('telemetry_seconds', 60.0)
+    command_record = params.get('command_record', "")
+    command_replay = params.get('command_replay', "")
+    lockstep = params.get('lockstep', False)
+    lockstep_ack = params.get('lockstep_ack', False)
+    joint_stream_enabled = params.get('joint_stream', True)
+    joint_ticks_per_msg = params.get('joint_ticks_per_msg', 1)
+    if camera and not use_ros:
+        # images and tf only exist as ros messages
+        rospy.logwarn("the camera needs the ros transport, it is disabled")
+        camera = False
+    if command_record:
+        command_log = CommandLog()
+        transport.on_shutdown(lambda: command_log.save(os.path.expanduser(command_record)))
+    if command_replay:
+        command_player = CommandPlayer(load_commands(os.path.expanduser(command_replay)))
+    if lockstep:
+        # the simulation owns the time, it runs as fast as the acks come in
+        sim_clock = SimClock(transport, freq, lockstep_ack)
+        real_time_factor = 0
+    if terrain_seed is None:
+        terrain_seed = random.randrange(1 << 31)
+    rospy.loginfo("lateralFriction = " + str(lateralFriction) + " spinningFriction = " + str(spinningFriction))
+    rospy.loginfo(" freq = " + str(freq) + " PID = " + str([stand_kp, stand_kd, joint_kp, joint_kd]))
+    rospy.loginfo("headless = " + str(headless) + " real_time_factor = " + str(real_time_factor))
+
+    so_file = find_library(path)
     if(not os.path.exists(so_file)):
         rospy.logerr("cannot find cpp.so file")
-    cpp_gait_ctrller = ctypes.cdll.LoadLibrary(so_file)
-    cpp_gait_ctrller.toque_calculator.restype = ctypes.POINTER(StructPointer)
-    ### add by shimizu
-    cpp_gait_ctrller.get_zebra_joint_control.restype = ctypes.POINTER(ZebraPointer)
-    N_Motors = 12
-    joint_control = ZebraJointControl()
-    joint_control.enable = [True for _ in range(N_Motors)]
-    joint_control.position = [0 for _ in range(N_Motors)]
-    joint_control.velocity= [0 for _ in range(N_Motors)]
-    joint_control.kp= [0 for _ in range(N_Motors)]
-    joint_control.kd= [0 for _ in range(N_Motors)]
-    joint_control.effort= [0 for _ in range(N_Motors)]
-        
-    pub_zebra_ctrl = rospy.Publisher("/ZebraJointControl", ZebraJointControl, queue_size=1)
-
-    ###
+    cpp_gait_ctrller = GaitCtrller(so_file)
     rospy.loginfo("find so file = " + so_file)
 
-    s = rospy.Service('gait_type', QuadrupedCmd, callback_gait)
-    s1 = rospy.Service('robot_mode', QuadrupedCmd, callback_mode)
-    rospy.Subscriber("cmd_vel", Twist, callback_body_vel, buff_size=10000)
+    transport.serve('gait_type', callback_gait)
+    transport.serve('robot_mode', callback_mode)
+    transport.subscribe("cmd_vel", callback_body_vel)
+
+    if camera and camera_process:
+        camera_state, camera_proc = start_camera_worker(
+            dict(terrain=terrain, path=path, lateral_friction=lateralFriction, seed=terrain_seed),
+            spinningFriction,
+            dict(width=camera_width, height=camera_height, encoding=camera_encoding),
+            rates.get("camera", 20.0))
 
+    init_publishers()
+    init_scheduler()
     init_simulator()
+    init_ui_tasks()
 
     add_thread = threading.Thread(target=thread_job)
     add_thread.start()
 
-    if camera:
-        add_thread_1 = threading.Thread(target=camera_update)
-        add_thread_1.start()
-
     main()
@@ -73,6 +73,16 @@ public:
   void printStateCommandInfo();
   float deadband(float command, T minVal, T maxVal);
 
+  // save or load the filtered command
+  void serializeState(StateBuffer& buf) {
+    buf.field(leftAnalogStick);
+    buf.field(rightAnalogStick);
+    buf.field(data);
+    buf.field(trigger_pressed);
+    buf.field(A);
+    buf.field(printIter);
+  }
+
   // These should come from the inferface
   T maxRoll = 0.4;
   T minRoll = -0.4;
@@ -9,6 +9,7 @@
 #define CHEETAH_SOFTWARE_FOOTSWINGTRAJECTORY_H
 
 #include "Utilities/cppTypes.h"
+#include "Utilities/StateBuffer.h"
 
 /*!
  * A foot swing trajectory for a single foot
@@ -80,6 +81,18 @@ public:
     return _a;
   }
 
+  /*!
+   * Save or load the trajectory
+   */
+  void serializeState(StateBuffer& buf) {
+    buf.field(_p0);
+    buf.field(_pf);
+    buf.field(_p);
+    buf.field(_v);
+    buf.field(_a);
+    buf.field(_height);
+  }
+
 private:
   Vec3<T> _p0, _pf, _p, _v, _a;
   T _height;
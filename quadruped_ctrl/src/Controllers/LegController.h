@@ -22,6 +22,7 @@
 #include "Dynamics/Quadruped.h"
 #include "RobotLegState.h"
 #include "Utilities/cppTypes.h"
+#include "Utilities/StateBuffer.h"
 // #include "SimUtilities/SpineBoard.h"
 // #include "SimUtilities/ti_boardcontrol.h"
 
@@ -85,6 +86,28 @@ class LegController {
    */
   void setMaxTorqueCheetah3(T tau) { _maxTorque = tau; }
 
+  /*!
+   * Save or load commands and leg data, the quadruped stays as it is
+   */
+  void serializeState(StateBuffer& buf) {
+    for (int leg = 0; leg < 4; leg++) {
+      buf.field(commands[leg]);
+      buf.field(datas[leg].q);
+      buf.field(datas[leg].qd);
+      buf.field(datas[leg].p);
+      buf.field(datas[leg].v);
+      buf.field(datas[leg].J);
+      buf.field(datas[leg].tauEstimate);
+    }
+    buf.field(_legsEnabled);
+    buf.field(_maxTorque);
+    buf.field(_zeroEncoders);
+    buf.field(_calibrateEncoders);
+    buf.field(flags);
+    buf.field(init_pos);
+    buf.field(myflags);
+  }
+
   LegControllerCommand<T> commands[4];
   LegControllerData<T> datas[4];
   Quadruped<T>& _quadruped;
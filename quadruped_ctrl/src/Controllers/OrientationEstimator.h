@@ -33,6 +33,10 @@ class VectorNavOrientationEstimator : public GenericEstimator<T> {
  public:
   virtual void run();
   virtual void setup() {}
+  virtual void serializeState(StateBuffer& buf) {
+    buf.field(_b_first_visit);
+    buf.field(_ori_ini_inv);
+  }
   
  protected:
   bool _b_first_visit = true;
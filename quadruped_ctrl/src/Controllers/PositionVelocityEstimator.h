@@ -23,6 +23,18 @@ class LinearKFPositionVelocityEstimator : public GenericEstimator<T> {
   LinearKFPositionVelocityEstimator();
   virtual void run();
   virtual void setup();
+  virtual void serializeState(StateBuffer& buf) {
+    buf.field(legData);
+    buf.field(_xhat);
+    buf.field(_ps);
+    buf.field(_vs);
+    buf.field(_A);
+    buf.field(_Q0);
+    buf.field(_P);
+    buf.field(_R0);
+    buf.field(_B);
+    buf.field(_C);
+  }
   LegData legData;
 
  private:
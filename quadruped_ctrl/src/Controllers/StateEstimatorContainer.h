@@ -13,6 +13,7 @@
 #include "RobotParameters.h"
 #include "LegController.h"
 #include "Utilities/IMUTypes.h"
+#include "Utilities/StateBuffer.h"
 // #include "SimUtilities/VisualizationData.h"
 // #include "state_estimator_lcmt.hpp"
 
@@ -77,6 +78,11 @@ class GenericEstimator {
 
   void setData(StateEstimatorData<T> data) { _stateEstimatorData = data; }
 
+  /*!
+   * Save or load the internal state of the estimator, if it has one
+   */
+  virtual void serializeState(StateBuffer& buf) { (void)buf; }
+
   virtual ~GenericEstimator() = default;
   StateEstimatorData<T> _stateEstimatorData;
 };
@@ -173,6 +179,17 @@ class StateEstimatorContainer {
     _estimators.clear();
   }
 
+  /*!
+   * Save or load the state of all estimators, the same estimators have to be
+   * added in the same order
+   */
+  void serializeState(StateBuffer& buf) {
+    buf.field(_phase);
+    for (auto estimator : _estimators) {
+      estimator->serializeState(buf);
+    }
+  }
+
   ~StateEstimatorContainer() {
     for (auto estimator : _estimators) {
       delete estimator;
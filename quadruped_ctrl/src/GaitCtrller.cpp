@@ -50,6 +50,56 @@ GaitCtrller::~GaitCtrller() {
   delete safetyChecker;
 }
 
+// written first, a buffer without it is not a controller state
+static const unsigned int kStateMagic = 0x51435331;
+
+void GaitCtrller::SerializeState(StateBuffer& buf) {
+  unsigned int magic = kStateMagic;
+  buf.field(magic);
+  if (magic != kStateMagic) {
+    buf.fail();
+    return;
+  }
+  buf.field(_gaitType);
+  buf.field(_robotMode);
+  buf.field(_safetyCheck);
+  buf.bytes(&_gamepadCommand[0], _gamepadCommand.size() * sizeof(double));
+  buf.field(ctrlParam);
+  buf.field(_legdata);
+  buf.field(legcommand);
+  buf.field(_vectorNavData);
+  buf.field(_stateEstimate);
+  convexMPC->serializeState(buf);
+  _legController->serializeState(buf);
+  _stateEstimator->serializeState(buf);
+  _desiredStateCommand->serializeState(buf);
+}
+
+size_t GaitCtrller::StateSize() {
+  StateBuffer counter(NULL, 0, false);
+  SerializeState(counter);
+  return counter.size();
+}
+
+bool GaitCtrller::SaveState(char* buf, size_t size) {
+  if (size < StateSize()) {
+    return false;
+  }
+  StateBuffer writer(buf, size, false);
+  SerializeState(writer);
+  return writer.ok();
+}
+
+bool GaitCtrller::LoadState(char* buf, size_t size) {
+  // check size and magic before anything is overwritten
+  if (size != StateSize() || *(unsigned int*)buf != kStateMagic) {
+    return false;
+  }
+  StateBuffer reader(buf, size, true);
+  SerializeState(reader);
+  return reader.ok();
+}
+
 void GaitCtrller::SetIMUData(double* imuData) {
   _vectorNavData.accelerometer(0, 0) = imuData[0];
   _vectorNavData.accelerometer(1, 0) = imuData[1];
@@ -18,6 +18,7 @@
 #include "Dynamics/MiniCheetah.h"
 #include "MPC_Ctrl/ConvexMPCLocomotion.h"
 #include "Utilities/IMUTypes.h"
+#include "Utilities/StateBuffer.h"
 #include "calculateTool.h"
 
 ////add by shimizu
@@ -54,7 +55,13 @@ class GaitCtrller {
 LegControllerData<float> GetLegControllerData(int leg){
   return _legController->datas[leg];
 }
+  // flat copy of everything that changes between calls, a state can only be
+  // loaded into a controller of the same build
+  size_t StateSize();
+  bool SaveState(char* buf, size_t size);
+  bool LoadState(char* buf, size_t size);
  private:
+  void SerializeState(StateBuffer& buf);
   int _gaitType = 0;
   int _robotMode = 0;
   bool _safetyCheck = true;
@@ -76,6 +83,16 @@ LegControllerData<float> GetLegControllerData(int leg){
   SafetyChecker<float>* safetyChecker;
 };
 
+// state of one controller instance for the handle based C API, the outputs
+// live next to the controller so every handle has its own result buffers.
+// the MPC solver keeps its scratch data in globals, so handles must be stepped
+// from one thread at a time
+struct CtrlHandle {
+  GaitCtrller* ctrller;
+  JointEff jointEff;
+  Zebra joint_control;
+};
+
 extern "C" {
 
 GaitCtrller* gCtrller = NULL;
@@ -83,6 +100,32 @@ JointEff jointEff;
 ////add by shimizu
 Zebra joint_control;
 
+static void calc_toque(GaitCtrller* ctrller, double imuData[], double motorData[],
+                       JointEff* out) {
+  double eff[12] = {0.0};
+  ctrller->ToqueCalculator(imuData, motorData, eff);
+  for (int i = 0; i < 12; i++) {
+    out->eff[i] = eff[i];
+  }
+}
+
+static void fill_zebra(GaitCtrller* ctrller, Zebra* out) {
+  for(int leg = 0; leg<4; leg++){
+    LegControllerCommand<float> command = ctrller->GetLegControllerCommand(leg);
+    LegControllerData<float> now_data = ctrller->GetLegControllerData(leg);
+    Vec3<float> legTorque = now_data.J.transpose() * command.forceFeedForward;
+
+    for(int i = 0; i < 3; i++){
+      int n = 3*leg + i;
+      out->position[n] = command.qDes[i];
+      out->velocity[n] = command.qdDes[i];
+      out->kp[n] = command.kpCartesian(0,0);
+      out->kd[n] = command.kdCartesian(0,0);
+      out->effort[n] = command.tauFeedForward[i] + legTorque[i];
+    }
+  }
+}
+
 // first step, init the controller
 void init_controller(double freq, double PIDParam[]) {
   if (NULL != gCtrller) {
@@ -107,37 +150,90 @@ void set_robot_vel(double vel[]) { gCtrller->SetRobotVel(vel); }
 
 // after init controller and pre work, the mpc calculator can work
 JointEff* toque_calculator(double imuData[], double motorData[]) {
-  double eff[12] = {0.0};
-  gCtrller->ToqueCalculator(imuData, motorData, eff);
-  for (int i = 0; i < 12; i++) {
-    jointEff.eff[i] = eff[i];
-  }
+  calc_toque(gCtrller, imuData, motorData, &jointEff);
   // std::cout << "qDes"<<gCtrller->GetLegControllerCommand(0).kpCartesian<< std::endl;
   return &jointEff;
 }
 
 ////add by shimizu
 Zebra* get_zebra_joint_control(){
-// double eff[12] = {0.0};
-// gCtrller->ToqueCalculator(imuData, motorData, eff);
+  fill_zebra(gCtrller, &joint_control);
+  return &joint_control;
+}
 
-  for(int leg = 0; leg<4; leg++){
-    LegControllerCommand<float> command = gCtrller->GetLegControllerCommand(leg);
-    LegControllerData<float> now_data = gCtrller->GetLegControllerData(leg);
-    Vec3<float> legTorque = now_data.J.transpose() * command.forceFeedForward;
+// size of the buffer for save_controller_state
+int controller_state_size() { return gCtrller->StateSize(); }
 
-    for(int i = 0; i < 3; i++){
-      int n = 3*leg + i;
-  joint_control.position[n]=command.qDes[i];
-  joint_control.velocity[n] = command.qdDes[i];
-  joint_control.kp[n]=command.kpCartesian(0,0);
-  joint_control.kd[n]=command.kdCartesian(0,0);
-  joint_control.effort[n]=command.tauFeedForward[i] + legTorque[i];
-  }
-  }
-  return &joint_control;
+// returns the bytes written, -1 if the buffer is too small
+int save_controller_state(char buf[], int size) {
+  return gCtrller->SaveState(buf, size) ? (int)gCtrller->StateSize() : -1;
 }
 
+// returns 0, -1 if the buffer does not hold a state of this controller
+int load_controller_state(char buf[], int size) {
+  return gCtrller->LoadState(buf, size) ? 0 : -1;
+}
+
+// handle based variants, any number of controllers can live in one process
+CtrlHandle* create_controller(double freq, double PIDParam[]) {
+  CtrlHandle* handle = new CtrlHandle();
+  handle->ctrller = new GaitCtrller(freq, PIDParam);
+  return handle;
+}
+
+// re-create the controller of a handle, its result buffers stay in place
+void init_controller_h(CtrlHandle* handle, double freq, double PIDParam[]) {
+  delete handle->ctrller;
+  handle->ctrller = new GaitCtrller(freq, PIDParam);
+}
+
+void destroy_controller(CtrlHandle* handle) {
+  delete handle->ctrller;
+  delete handle;
+}
+
+void pre_work_h(CtrlHandle* handle, double imuData[], double legData[]) {
+  handle->ctrller->PreWork(imuData, legData);
+}
+
+void set_gait_type_h(CtrlHandle* handle, int gaitType) {
+  handle->ctrller->SetGaitType(gaitType);
+}
+
+void set_robot_mode_h(CtrlHandle* handle, int mode) {
+  handle->ctrller->SetRobotMode(mode);
+}
+
+void set_robot_vel_h(CtrlHandle* handle, double vel[]) {
+  handle->ctrller->SetRobotVel(vel);
+}
+
+JointEff* toque_calculator_h(CtrlHandle* handle, double imuData[], double motorData[]) {
+  calc_toque(handle->ctrller, imuData, motorData, &handle->jointEff);
+  return &handle->jointEff;
+}
+
+Zebra* get_zebra_joint_control_h(CtrlHandle* handle) {
+  fill_zebra(handle->ctrller, &handle->joint_control);
+  return &handle->joint_control;
+}
+
+// result buffers of a handle, valid until destroy_controller
+JointEff* get_joint_eff_h(CtrlHandle* handle) { return &handle->jointEff; }
+
+Zebra* get_zebra_h(CtrlHandle* handle) { return &handle->joint_control; }
+
+int controller_state_size_h(CtrlHandle* handle) {
+  return handle->ctrller->StateSize();
+}
+
+int save_controller_state_h(CtrlHandle* handle, char buf[], int size) {
+  return handle->ctrller->SaveState(buf, size) ? (int)handle->ctrller->StateSize() : -1;
+}
+
+int load_controller_state_h(CtrlHandle* handle, char buf[], int size) {
+  return handle->ctrller->LoadState(buf, size) ? 0 : -1;
+}
 
 }
 
@@ -68,6 +68,75 @@ void ConvexMPCLocomotion::initialize() {
   firstRun = true;
 }
 
+// the sparse solver is not used (cmpc_use_sparse), its data is left out
+void ConvexMPCLocomotion::serializeState(StateBuffer& buf) {
+  buf.field(currently_jumping);
+  buf.field(pBody_des);
+  buf.field(vBody_des);
+  buf.field(aBody_des);
+  buf.field(pBody_RPY_des);
+  buf.field(vBody_Ori_des);
+  buf.field(pFoot_des);
+  buf.field(vFoot_des);
+  buf.field(aFoot_des);
+  buf.field(Fr_des);
+  buf.field(contact_state);
+
+  buf.field(_yaw_turn_rate);
+  buf.field(_yaw_des);
+  buf.field(_yaw_des_true);
+  buf.field(_roll_des);
+  buf.field(_pitch_des);
+  buf.field(_x_vel_des);
+  buf.field(_y_vel_des);
+  buf.field(_body_height);
+  buf.field(_body_height_running);
+  buf.field(_body_height_jumping);
+
+  buf.field(iterationsBetweenMPC);
+  buf.field(horizonLength);
+  buf.field(default_iterations_between_mpc);
+  buf.field(dt);
+  buf.field(dtMPC);
+  buf.field(iterationCounter);
+  buf.field(f_ff);
+  buf.field(swingTimes);
+  for (int i = 0; i < 4; i++) footSwingTrajectories[i].serializeState(buf);
+
+  aio.serializeState(buf);
+  trotting.serializeState(buf);
+  bounding.serializeState(buf);
+  pronking.serializeState(buf);
+  jumping.serializeState(buf);
+  galloping.serializeState(buf);
+  standing.serializeState(buf);
+  trotRunning.serializeState(buf);
+  walking.serializeState(buf);
+  walking2.serializeState(buf);
+  pacing.serializeState(buf);
+
+  buf.field(Kp);
+  buf.field(Kd);
+  buf.field(Kp_stance);
+  buf.field(Kd_stance);
+  buf.field(Kp1);
+  buf.field(firstRun);
+  buf.field(firstSwing);
+  buf.field(swingTimeRemaining);
+  buf.field(stand_traj);
+  buf.field(current_gait);
+  buf.field(gaitNumber);
+  buf.field(world_position_desired);
+  buf.field(rpy_int);
+  buf.field(rpy_comp);
+  buf.field(x_comp_integral);
+  buf.field(pFoot);
+  buf.field(result);
+  buf.field(trajAll);
+  buf.field(myflags);
+  buf.field(jump_state);
+}
+
 void ConvexMPCLocomotion::recompute_timing(int iterations_per_mpc) {
   iterationsBetweenMPC = iterations_per_mpc;
   dtMPC = dt * iterations_per_mpc;
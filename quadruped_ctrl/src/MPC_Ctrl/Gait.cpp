@@ -18,6 +18,9 @@ OffsetDurationGait::OffsetDurationGait(int nSegment, Vec4<int> offsets, Vec4<int
   // _stance = durations[0];
   // _swing = nSegment - durations[0];
   setGaitParam(nSegment, offsets, durations, name);
+  // the phase is read before the first setIterations() in low power mode
+  _iteration = 0;
+  _phase = 0;
 }
 
 void OffsetDurationGait::setGaitParam(int nSegment, Vec4<int> offsets, Vec4<int> durations, const std::string& name = "walk") {
@@ -40,6 +43,22 @@ void OffsetDurationGait::setGaitParam(int nSegment, Vec4<int> offsets, Vec4<int>
   // _swing = nSegment - durations[0];
 }
 
+// the mpc table is refilled by every getMpcTable(), only its size is state
+void OffsetDurationGait::serializeState(StateBuffer& buf) {
+  int nIterations = _nIterations;
+  buf.field(_offsets);
+  buf.field(_durations);
+  buf.field(_offsetsFloat);
+  buf.field(_durationsFloat);
+  buf.field(_iteration);
+  buf.field(_nIterations);
+  buf.field(_phase);
+  if (buf.loading() && _nIterations != nIterations) {
+    delete[] _mpc_table;
+    _mpc_table = new int[_nIterations * 4];
+  }
+}
+
 MixedFrequncyGait::MixedFrequncyGait(int nSegment, Vec4<int> periods, float duty_cycle, const std::string &name) {
   _name = name;
   _duty_cycle = duty_cycle;
@@ -5,6 +5,7 @@
 #include <queue>
 
 #include "Utilities/cppTypes.h"
+#include "Utilities/StateBuffer.h"
 
 
 class Gait {
@@ -43,6 +44,7 @@ public:
   float getCurrentGaitPhase();
   int getGaitHorizon();
   void debugPrint();
+  void serializeState(StateBuffer& buf);
 
 private:
   int* _mpc_table = NULL;
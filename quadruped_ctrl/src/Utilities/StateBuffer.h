@@ -0,0 +1,64 @@
+/*! @file StateBuffer.h
+ *  @brief Flat byte image of the controller state
+ */
+
+#ifndef PROJECT_STATEBUFFER_H
+#define PROJECT_STATEBUFFER_H
+
+#include <stddef.h>
+#include <string.h>
+
+/*!
+ * Saves fields into a byte buffer or loads them back in the same order, so
+ * every class lists its state once in serializeState(). With a NULL buffer
+ * only the size is counted. Fields must be plain values: scalars, arrays and
+ * fixed size Eigen types, never pointers or heap owning containers.
+ */
+class StateBuffer {
+ public:
+  StateBuffer(char* data, size_t size, bool loading)
+      : _data(data), _size(size), _pos(0), _loading(loading), _ok(true) {}
+
+  /*!
+   * Copy one field to or from the buffer
+   */
+  template <typename T>
+  void field(T& value) {
+    bytes(&value, sizeof(T));
+  }
+
+  void bytes(void* value, size_t n) {
+    if (_data != NULL) {
+      if (_pos + n > _size) {
+        _ok = false;
+      } else if (_loading) {
+        memcpy(value, _data + _pos, n);
+      } else {
+        memcpy(_data + _pos, value, n);
+      }
+    }
+    _pos += n;
+  }
+
+  bool loading() const { return _loading; }
+
+  /*!
+   * Bytes saved or loaded so far, the full size after a counting pass
+   */
+  size_t size() const { return _pos; }
+
+  /*!
+   * False when the buffer was too small or did not hold a controller state
+   */
+  bool ok() const { return _ok; }
+  void fail() { _ok = false; }
+
+ private:
+  char* _data;
+  size_t _size;
+  size_t _pos;
+  bool _loading;
+  bool _ok;
+};
+
+#endif  // PROJECT_STATEBUFFER_H
@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(package_path, "scripts"))
+from command_log import CommandLog, CommandPlayer, CommandQueue
+
+
+class Recorder(object):
+    # stands in for GaitCtrller, keeps the calls in order
+    def __init__(self):
+        self.calls = []
+
+    def set_robot_vel(self, vel):
+        self.calls.append(("vel", tuple(vel)))
+
+    def set_gait_type(self, gait_type):
+        self.calls.append(("gait", gait_type))
+
+    def set_robot_mode(self, mode):
+        self.calls.append(("mode", mode))
+
+
+class CommandQueueTest(unittest.TestCase):
+
+    def test_latest_velocity_survives_a_burst(self):
+        queue = CommandQueue()
+        for i in range(10):
+            queue.set_robot_vel([0.1 * i, 0.0, 0.0])
+        target = Recorder()
+        log = CommandLog()
+        queue.drain(target, 5, log)
+        self.assertEqual(target.calls, [("vel", (0.9, 0.0, 0.0))])
+        self.assertEqual(log.commands, [(5, "vel", [0.9, 0.0, 0.0])])
+
+        # nothing new arrived, the velocity is not applied again
+        queue.drain(target, 6, log)
+        self.assertEqual(len(target.calls), 1)
+
+    def test_changes_keep_their_order_before_the_velocity(self):
+        queue = CommandQueue()
+        queue.set_robot_vel([0.2, 0.0, 0.0])
+        queue.set_gait_type(1)
+        queue.set_robot_mode(0)
+        queue.set_gait_type(3)
+        target = Recorder()
+        queue.drain(target)
+        self.assertEqual(target.calls, [("gait", 1), ("mode", 0), ("gait", 3),
+                                        ("vel", (0.2, 0.0, 0.0))])
+
+
+class CommandPlayerTest(unittest.TestCase):
+
+    def test_episodes_replay_in_order_across_a_reset(self):
+        # the ticks start over after the reset, the second episode must not
+        # be applied before it
+        commands = [(30, "vel", [0.3, 0.0, 0.0]),
+                    (10, "gait", [1.0]),
+                    (40, "reset", []),
+                    (20, "vel", [0.5, 0.0, 0.0]),
+                    (5, "mode", [0.0])]
+        player = CommandPlayer(commands)
+        target = Recorder()
+        resets = []
+        tick = 0
+        for _ in range(70):
+            # a scheduler step, then the reset check between two ticks as in
+            # walking_simulation's loop
+            player.apply(tick, target)
+            tick += 1
+            if player.reset_due(tick):
+                resets.append((tick, list(target.calls)))
+                tick = 0
+
+        self.assertEqual(resets, [(40, [("gait", 1), ("vel", (0.3, 0.0, 0.0))])])
+        self.assertEqual(target.calls, [("gait", 1), ("vel", (0.3, 0.0, 0.0)),
+                                        ("mode", 0), ("vel", (0.5, 0.0, 0.0))])
+        self.assertFalse(player.reset_due(100))
+
+
+if __name__ == '__main__':
+    unittest.main()
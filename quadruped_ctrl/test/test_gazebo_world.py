@@ -0,0 +1,43 @@
+import os
+import sys
+import unittest
+import pybullet
+from pybullet_utils import bullet_client
+
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(package_path, "scripts"))
+from sim_world import load_terrain
+
+
+def world_bodies(visual):
+    # (pose, collision shapes, dynamics) of every body of the racetrack
+    client = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+    cwd = os.getcwd()
+    try:
+        load_terrain(client, "racetrack", package_path, 1.0, visual=visual)
+        bodies = []
+        for index in range(client.getNumBodies()):
+            body = client.getBodyUniqueId(index)
+            bodies.append((client.getBasePositionAndOrientation(body),
+                           client.getCollisionShapeData(body, -1),
+                           client.getDynamicsInfo(body, -1)))
+        return bodies
+    finally:
+        os.chdir(cwd)
+        client.disconnect()
+
+
+class GazeboWorldTest(unittest.TestCase):
+    # the racetrack without visual meshes has to collide like the full one
+
+    def test_collision_only_world_matches(self):
+        full = world_bodies(visual=True)
+        collision_only = world_bodies(visual=False)
+        self.assertGreater(len(full), 0)
+        self.assertEqual(len(collision_only), len(full))
+        for index, (expected, actual) in enumerate(zip(full, collision_only)):
+            self.assertEqual(actual, expected, "body %d differs" % index)
+
+
+if __name__ == "__main__":
+    unittest.main()
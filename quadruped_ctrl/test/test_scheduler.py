@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(package_path, "scripts"))
+from scheduler import TickScheduler
+
+
+class TickSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        # free-running, no budget and no overrun warnings
+        self.scheduler = TickScheduler(500.0, real_time_factor=0)
+        self.runs = []
+
+    def add(self, name, rate=None, phase=0, control=False):
+        return self.scheduler.add(name, lambda: self.runs.append((self.scheduler.tick, name)),
+                                  rate, phase, control)
+
+    def ticks_of(self, name):
+        return [tick for tick, task in self.runs if task == name]
+
+    def test_periods_and_phases(self):
+        self.assertEqual(self.add("every").period, 1)
+        self.assertEqual(self.add("mpc", 100.0).period, 5)
+        self.assertEqual(self.add("camera", 20.0, phase=3).period, 25)
+        # a phase past the period wraps around, a rate above freq runs every tick
+        self.assertEqual(self.add("wrapped", 100.0, phase=7).phase, 2)
+        self.assertEqual(self.add("fast", 1000.0).period, 1)
+        for _ in range(50):
+            self.scheduler.step()
+
+        self.assertEqual(self.ticks_of("every"), list(range(50)))
+        self.assertEqual(self.ticks_of("mpc"), list(range(0, 50, 5)))
+        self.assertEqual(self.ticks_of("camera"), [3, 28])
+        self.assertEqual(self.ticks_of("wrapped"), list(range(2, 50, 5)))
+        self.assertEqual(self.ticks_of("fast"), list(range(50)))
+        self.assertEqual(self.scheduler.rate_of("mpc"), 100.0)
+        self.assertIsNone(self.scheduler.rate_of("missing"))
+
+    def test_order_of_registration_within_a_tick(self):
+        self.add("first")
+        self.add("second", 100.0)
+        self.add("third")
+        self.scheduler.step()
+        self.assertEqual(self.runs, [(0, "first"), (0, "second"), (0, "third")])
+
+    def test_control_only_step(self):
+        self.add("sim_read", control=True)
+        self.add("ui", 100.0)
+        self.add("mpc", 100.0, control=True)
+        for _ in range(10):
+            self.scheduler.step(control_only=True)
+        self.assertEqual(self.ticks_of("ui"), [])
+        self.assertEqual(self.ticks_of("sim_read"), list(range(10)))
+        self.assertEqual(self.ticks_of("mpc"), [0, 5])
+
+        # the tick kept counting, the full step runs every task on its phase
+        self.scheduler.step()
+        self.assertEqual(self.runs[-2:], [(10, "ui"), (10, "mpc")])
+        self.scheduler.reset()
+        self.assertEqual(self.scheduler.tick, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy
+
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(package_path, "scripts"))
+from gait_ctrller import N_Motors
+from telemetry import TelemetryRecorder, load_telemetry
+
+
+def record(recorder, tick):
+    # every field of the row holds the tick, so a row shows where it came from
+    recorder.record(tick, numpy.full(10, tick), numpy.full(24, tick), numpy.full(3, tick),
+                    numpy.full(N_Motors, tick), numpy.full((5, N_Motors), tick),
+                    numpy.full(N_Motors, tick))
+
+
+class TelemetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "telemetry.npy")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_order_after_wrap_around(self):
+        # a reset sends the tick back to 0, the log keeps the order of writing
+        recorder = TelemetryRecorder(self.path, 5)
+        ticks = [10, 11, 12, 0, 1, 2, 3]
+        for tick in ticks:
+            record(recorder, tick)
+        recorder.close()
+
+        log = load_telemetry(self.path)
+        self.assertEqual(list(log["seq"]), [2, 3, 4, 5, 6])
+        self.assertEqual(list(log["tick"]), ticks[2:])
+        self.assertEqual(list(log["base_pos"][:, 0]), ticks[2:])
+        self.assertEqual(list(log["mcp_force"][:, -1]), ticks[2:])
+
+    def test_unwritten_rows_are_left_out(self):
+        recorder = TelemetryRecorder(self.path, 5)
+        record(recorder, 7)
+        record(recorder, 8)
+        recorder.close()
+        self.assertEqual(list(load_telemetry(self.path)["tick"]), [7, 8])
+
+    def test_record_after_close_is_ignored(self):
+        recorder = TelemetryRecorder(self.path, 5)
+        record(recorder, 1)
+        recorder.close()
+        record(recorder, 2)
+        recorder.close()
+        log = load_telemetry(self.path)
+        self.assertEqual(list(log["tick"]), [1])
+        self.assertEqual(recorder.count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
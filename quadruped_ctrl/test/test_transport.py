@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import unittest
+import numpy
+
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(package_path, "scripts"))
+from transport import LocalTransport, SlotBusy
+
+
+class LocalTransportTest(unittest.TestCase):
+
+    def test_read_returns_the_latest_values(self):
+        transport = LocalTransport()
+        out = numpy.zeros(7)
+        self.assertEqual(transport.read("odom", out)[0], 0)
+        transport.publish("odom", numpy.arange(7.0), stamp=3.0)
+        transport.publish("odom", numpy.arange(7.0) + 1, stamp=4.0)
+        self.assertEqual(transport.read("odom", out), (2, 4.0))
+        numpy.testing.assert_array_equal(out, numpy.arange(7.0) + 1)
+
+    def test_read_times_out_while_the_slot_is_written(self):
+        # a writer that died between the two increments leaves the counter odd
+        transport = LocalTransport()
+        transport.publish("odom", numpy.zeros(7))
+        transport._slot("odom")[0] += 1
+        out = numpy.zeros(7)
+        start = time.time()
+        with self.assertRaises(SlotBusy):
+            transport.read("odom", out, timeout=0.05)
+        elapsed = time.time() - start
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 1.0)
+
+    def test_dispatch_in_the_order_sent(self):
+        # the owner sees the commands of another process in stamp order, not
+        # in the order of the slots
+        name = "quadruped_test_%d" % os.getpid()
+        owner = LocalTransport(shm_name=name, create=True)
+        client = LocalTransport(shm_name=name)
+        try:
+            received = []
+            owner.subscribe("cmd_vel", lambda values: received.append(("cmd_vel", list(values))))
+            owner.serve("gait_type", lambda cmd: received.append(("gait_type", cmd)))
+            owner.serve("robot_mode", lambda cmd: received.append(("robot_mode", cmd)))
+
+            client.publish("robot_mode", [1], stamp=2.0)
+            client.publish("cmd_vel", [0.3, 0.0, 0.1], stamp=3.0)
+            client.publish("gait_type", [4], stamp=1.0)
+            owner.poll()
+            self.assertEqual(received, [("gait_type", 4), ("robot_mode", 1),
+                                        ("cmd_vel", [0.3, 0.0, 0.1])])
+
+            # nothing new, nothing dispatched
+            owner.poll()
+            self.assertEqual(len(received), 3)
+        finally:
+            client.shutdown()
+            owner.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()